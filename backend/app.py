@@ -1,22 +1,31 @@
+import time
+
+# Measured from here so the startup log shows what importing the app costs.
+_IMPORT_STARTED = time.perf_counter()
+
 import logging
 import os
 import asyncio
 from pathlib import Path
+from typing import Optional, Tuple
 
 from aiohttp import web
-from azure.identity import DefaultAzureCredential
+from azure.core.credentials import AzureKeyCredential
 
-from rtmt import RTMiddleTier, Tool
+from rtmt import RTMiddleTier, SessionRegistry, Tool
 from ragtools import (
     SearchInput,
     ReportGroundingInput,
-    create_rag_chain,
     search_implementation,
     report_grounding_implementation,
 )
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from langchain_openai import AzureOpenAIEmbeddings
+from embedding_cache import CachedQueryEmbeddings
+from evidence_cache import COLLECTION_VERSION_FILENAME, CollectionVersionWatcher, SemanticEvidenceCache
+from retrieval import ScoredRetriever
+from chunk_store import ChunkStore
+from lexical_index import BM25Index
+from health import Readiness
+import metrics
 
 # --- Centralized Configuration ---
 from config import settings
@@ -25,53 +34,241 @@ from config import settings
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("voicerag")
 
+# The Qdrant, LangChain/OpenAI and Azure identity libraries take seconds to
+# import. They are imported where first used: the knowledge base loads them
+# during warm-up, after the server is already listening and answering /healthz.
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+# How often the running app checks whether ingest.py has changed the collection.
+LOCAL_INDEX_CHECK_SECONDS = 5.0
+
+
+class KnowledgeBase:
+    """
+    The search components behind the tools: the Qdrant collection (or the
+    read-only snapshot), the chunk store, the BM25 index, the cached query
+    embeddings and the retriever built on them. `open()` is blocking and
+    slow, so the warm-up runs it in a thread.
+    """
+
+    def __init__(self):
+        self.qdrant_access = None
+        self.chunk_store: Optional[ChunkStore] = None
+        self.query_embeddings: Optional[CachedQueryEmbeddings] = None
+        self.retriever: Optional[ScoredRetriever] = None
+        # Differently worded questions with the same meaning reuse one search's evidence.
+        self.evidence_cache = SemanticEvidenceCache(
+            max_entries=settings.EVIDENCE_CACHE_SIZE,
+            min_similarity=settings.EVIDENCE_CACHE_MIN_SIMILARITY,
+            version_path=Path(settings.QDRANT_PATH) / COLLECTION_VERSION_FILENAME,
+        )
+
+    def open(self) -> None:
+        from langchain_openai import AzureOpenAIEmbeddings
+        from qdrant_access import QdrantAccess, build_search_params, open_qdrant_client
+
+        # --- Qdrant ---
+        if settings.QDRANT_READ_ONLY_SNAPSHOT:
+            from vector_snapshot import VectorSnapshot
+
+            # Multi-worker mode (serve.py): every worker maps the same read-only snapshot.
+            qdrant_client = VectorSnapshot(Path(settings.QDRANT_PATH))
+        else:
+            qdrant_client = open_qdrant_client(settings)
+        # All tool-time Qdrant calls go through this bounded, timed executor layer.
+        self.qdrant_access = QdrantAccess(
+            qdrant_client,
+            settings.QDRANT_COLLECTION_NAME,
+            max_workers=settings.QDRANT_MAX_WORKERS,
+            search_timeout=settings.QDRANT_SEARCH_TIMEOUT_SECONDS,
+            retrieve_timeout=settings.QDRANT_RETRIEVE_TIMEOUT_SECONDS,
+            search_params=build_search_params(settings),
+        )
+
+        self.chunk_store, lexical_index = self.load_local_indexes()
+
+        embedding_model = AzureOpenAIEmbeddings(
+            azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_version=settings.AZURE_OPENAI_EMBEDDING_API_VERSION,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            chunk_size=settings.AZURE_OPENAI_EMBEDDING_BATCH_SIZE,
+            # Queries are far below the context limit, so skip local tiktoken
+            # chunking (and its one-off encoding download) and send the raw text.
+            check_embedding_ctx_length=False,
+            show_progress_bar= True
+        )
+
+        # Repeated questions skip the Azure embedding round trip entirely.
+        self.query_embeddings = CachedQueryEmbeddings(
+            embedding_model,
+            max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+            persist_path=settings.QUERY_EMBEDDING_CACHE_PATH or None,
+            model_tag=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        )
+        self.query_embeddings.load()
+
+        # The search tool uses a single-pass scored retriever: one embedding, one Qdrant search.
+        self.retriever = ScoredRetriever(
+            qdrant=self.qdrant_access,
+            embeddings=self.query_embeddings,
+            k=settings.RETRIEVAL_K,
+            score_threshold=settings.RETRIEVAL_SCORE_THRESHOLD,
+            use_mmr=settings.RETRIEVAL_USE_MMR,
+            mmr_fetch_k=settings.RETRIEVAL_MMR_FETCH_K,
+            mmr_lambda=settings.RETRIEVAL_MMR_LAMBDA,
+            lexical_index=lexical_index,
+            chunk_store=self.chunk_store,
+            hybrid_candidates=settings.RETRIEVAL_HYBRID_CANDIDATES,
+            rrf_k=settings.RETRIEVAL_RRF_K,
+            embedding_timeout=settings.RETRIEVAL_EMBEDDING_BUDGET_MS / 1000,
+        )
+        logger.info("Qdrant retriever initialized successfully.")
+
+    @staticmethod
+    def load_local_indexes() -> Tuple[ChunkStore, Optional[BM25Index]]:
+        """Loads the chunk store and BM25 index that ingest.py writes next to the collection."""
+        # Grounding lookups are served from the chunk store written by ingest.py.
+        chunk_store = ChunkStore(Path(settings.QDRANT_PATH) / settings.CHUNK_STORE_FILENAME)
+        if len(chunk_store) == 0:
+            logger.warning("Chunk store is empty or missing; grounding lookups will query Qdrant. Run 'python ingest.py' to build it.")
+
+        # Local BM25 index for hybrid retrieval and the lexical-only fallback.
+        lexical_index = None
+        if settings.RETRIEVAL_HYBRID:
+            lexical_index = BM25Index.load(Path(settings.QDRANT_PATH) / settings.LEXICAL_INDEX_FILENAME)
+            if lexical_index is None:
+                logger.warning("Lexical index not found; retrieval will be dense-only. Run 'python ingest.py' to build it.")
+        return chunk_store, lexical_index
+
+    def use_local_indexes(self, chunk_store: ChunkStore, lexical_index: Optional[BM25Index]) -> None:
+        # The old chunk store is not closed here: a search or grounding lookup
+        # in flight may still read it. It is unmapped once nothing refers to it.
+        self.chunk_store = chunk_store
+        self.retriever.set_local_indexes(lexical_index, chunk_store)
+        logger.info(f"Reloaded the chunk store ({len(chunk_store)} chunks) and lexical index after re-ingestion.")
+
+    def close(self) -> None:
+        if self.query_embeddings is not None:
+            logger.info(f"Query embedding cache stats: {self.query_embeddings.stats()}")
+            try:
+                self.query_embeddings.save()
+            except Exception as e:
+                logger.error(f"Failed to persist query embedding cache: {e}")
+        logger.info(f"Semantic evidence cache stats: {self.evidence_cache.stats()}")
+        if self.qdrant_access is not None:
+            self.qdrant_access.close()
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+
+
+async def warm_up(knowledge_base: KnowledgeBase, rtmt: RTMiddleTier, readiness: Readiness) -> None:
+    """
+    Gets everything the first caller would otherwise wait for: opens the
+    collection and local indexes, then runs a probe search (a cold embedding
+    connection, cold index pages) while prefetching the Azure AD token. Only
+    a failure to open the knowledge base is fatal; the rest just means the
+    first caller pays for it.
+    """
+    try:
+        with readiness.phase("open"):
+            await asyncio.to_thread(knowledge_base.open)
+    except Exception as e:
+        logger.error("Could not open the knowledge base.", exc_info=True)
+        readiness.fail(f"{type(e).__name__}: {e}")
+        return
+
+    async def probe():
+        if not settings.WARM_UP_QUERY:
+            return
+        with readiness.phase("probe"):
+            try:
+                await asyncio.wait_for(knowledge_base.retriever.asearch(settings.WARM_UP_QUERY), settings.WARM_UP_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.warning(f"Warm-up search failed ({type(e).__name__}: {e}); the first search may be slow.")
+
+    async def token():
+        with readiness.phase("token"):
+            try:
+                await asyncio.wait_for(rtmt.warm_up(), settings.WARM_UP_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.warning(f"Could not prefetch Azure AD token during warm-up ({type(e).__name__}: {e}).")
+
+    await asyncio.gather(probe(), token())
+    readiness.mark_ready()
+
+
+async def watch_collection(knowledge_base: KnowledgeBase, readiness: Readiness) -> None:
+    """
+    Reloads the chunk store and BM25 index whenever ingest.py has changed the
+    collection (the same signal that clears the evidence cache), so hybrid
+    search never fuses fresh dense hits with a stale lexical index.
+    """
+    watcher = CollectionVersionWatcher(Path(settings.QDRANT_PATH) / COLLECTION_VERSION_FILENAME, LOCAL_INDEX_CHECK_SECONDS)
+    if not await readiness.wait():
+        return
+    while True:
+        await asyncio.sleep(watcher.check_interval)
+        if not watcher.changed():
+            continue
+        try:
+            indexes = await asyncio.to_thread(knowledge_base.load_local_indexes)
+        except Exception:
+            logger.error("Failed to reload the local indexes; keeping the previous ones.", exc_info=True)
+            continue
+        knowledge_base.use_local_indexes(*indexes)
+
+
+READINESS = web.AppKey("readiness", Readiness)
+_WARM_UP_TASK = web.AppKey("warm_up_task", asyncio.Task)
+_COLLECTION_WATCH_TASK = web.AppKey("collection_watch_task", asyncio.Task)
+
 
 async def create_app():
     """
     Creates and configures the main web application and its components.
-    This function is called once at startup.
+    This function is called once at startup; the knowledge base is opened
+    by the warm-up once the server is listening (see /readyz).
     """
-    logger.info("Starting application setup...")
+    logger.info(f"Starting application setup (app modules imported in {IMPORT_SECONDS * 1000:.0f}ms)...")
     if not settings.RUNNING_IN_PRODUCTION:
         logger.info("Running in development mode, loading from .env file")
 
-    # --- 1. Initialize Qdrant and Retriever ---
-    qdrant_client = QdrantClient(path=settings.QDRANT_PATH)
-    
-    embedding_model = AzureOpenAIEmbeddings(
-        azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_version=settings.AZURE_OPENAI_EMBEDDING_API_VERSION,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        chunk_size=settings.AZURE_OPENAI_EMBEDDING_BATCH_SIZE,
-        show_progress_bar= True
-    )
-    
-    # Use the recommended QdrantVectorStore class
-    vector_store = QdrantVectorStore(
-        client=qdrant_client,
-        collection_name=settings.QDRANT_COLLECTION_NAME,
-        embedding=embedding_model,
-    )
-    
-    retriever = vector_store.as_retriever(search_kwargs={"k": 1})
-    logger.info("Qdrant retriever initialized successfully.")
+    # --- 1. Health, Readiness and the Knowledge Base ---
+    app = web.Application()
+    # Calls are only admitted once the warm-up has finished.
+    readiness = Readiness(gated_paths=("/realtime",))
+    readiness.attach_to_app(app, "/healthz", "/readyz")
+    app[READINESS] = readiness
 
-    # --- 2. Initialize LLM, Bind Tools, and Create RAG Chain ---
+    knowledge_base = KnowledgeBase()
 
-    rag_chain = create_rag_chain(retriever)
-    logger.info("RAG chain created successfully.")
-    
-    # --- 3. Configure the Real-Time Middle Tier (RTMiddleTier) ---
-    app = web.Application()
+    async def start_warm_up(app_instance):
+        app_instance[_WARM_UP_TASK] = asyncio.create_task(warm_up(knowledge_base, rtmt, readiness))
+        if not settings.QDRANT_READ_ONLY_SNAPSHOT:
+            # In snapshot mode serve.py re-exports the snapshot and replaces the worker after
+            # an ingest; reloading only the local indexes here would pair them with stale vectors.
+            app_instance[_COLLECTION_WATCH_TASK] = asyncio.create_task(watch_collection(knowledge_base, readiness))
+
+    async def stop_warm_up(app_instance):
+        app_instance[_WARM_UP_TASK].cancel()
+        if _COLLECTION_WATCH_TASK in app_instance:
+            app_instance[_COLLECTION_WATCH_TASK].cancel()
 
     # Register a graceful shutdown handler
     async def on_shutdown(app_instance):
         logger.info("Application shutting down. Closing web server...")
+        knowledge_base.close()
+    app.on_startup.append(start_warm_up)
+    app.on_cleanup.append(stop_warm_up)
     app.on_shutdown.append(on_shutdown)
-    
-    # Use DefaultAzureCredential for robust authentication (managed identity, CLI, etc.)
-    credential = DefaultAzureCredential()
+
+    # --- 2. Configure the Real-Time Middle Tier (RTMiddleTier) ---
+
+    # Without an API key, RTMiddleTier uses DefaultAzureCredential for robust
+    # authentication (managed identity, CLI, etc.), created during the warm-up.
+    credential = AzureKeyCredential(settings.AZURE_OPENAI_API_KEY) if settings.AZURE_OPENAI_REALTIME_USE_API_KEY else None
     
     turn_detection_config = {
     "type": "server_vad",
@@ -88,6 +285,16 @@ async def create_app():
         turn_detection_config=turn_detection_config,
         voice_choice=settings.AZURE_OPENAI_VOICE_CHOICE
     )
+    rtmt.upstream_pool_size = settings.UPSTREAM_POOL_SIZE
+    rtmt.upstream_pool_max_age = settings.UPSTREAM_POOL_MAX_AGE_SECONDS
+    rtmt.token_refresh_margin = settings.AAD_TOKEN_REFRESH_MARGIN_SECONDS
+    rtmt.audio_coalesce_window = settings.AUDIO_COALESCE_MS / 1000
+    rtmt.audio_coalesce_max_bytes = settings.AUDIO_COALESCE_MAX_BYTES
+    rtmt.sessions = SessionRegistry(
+        max_sessions=settings.MAX_CONCURRENT_SESSIONS,
+        max_queued=settings.MAX_QUEUED_SESSIONS,
+        queue_timeout=settings.SESSION_QUEUE_TIMEOUT_SECONDS,
+    )
 
     # This system message is critical and is now loaded from an external file.
     try:
@@ -102,7 +309,7 @@ async def create_app():
         logger.critical(f"CRITICAL ERROR: Failed to read system_prompt.md: {e}")
         raise
 
-    # --- 4. Attach Tool Implementations to RTMiddleTier (Definitive Fix) ---
+    # --- 3. Attach Tool Implementations to RTMiddleTier (Definitive Fix) ---
 
     def format_tool_schema(pydantic_model, description: str):
         """
@@ -150,13 +357,21 @@ async def create_app():
     # Attach the tools to the RTMiddleTier instance using the perfectly formatted schemas.
     rtmt.tools["SearchInput"] = Tool(
         schema=search_schema,
-        target=lambda args: search_implementation(args["query"], retriever)
+        target=lambda args: search_implementation(
+            args["query"], knowledge_base.retriever, knowledge_base.evidence_cache, evidence_token_budget=settings.EVIDENCE_TOKEN_BUDGET
+        )
     )
     rtmt.tools["ReportGroundingInput"] = Tool(
         schema=grounding_schema,
-        target=lambda args: report_grounding_implementation(args["source_ids"], qdrant_client, settings.QDRANT_COLLECTION_NAME)
+        target=lambda args: report_grounding_implementation(args["source_ids"], knowledge_base.qdrant_access, knowledge_base.chunk_store)
     )
 
+    # Start the knowledge-base search from the user's transcript before the model asks for it.
+    if settings.SPECULATIVE_RETRIEVAL:
+        rtmt.speculative_tool = "SearchInput"
+        rtmt.speculative_arg = "query"
+        rtmt.speculation_min_similarity = settings.SPECULATION_MIN_SIMILARITY
+
     # This line now populates the list with the correctly structured schemas.
     rtmt.tool_schemas = [tool.schema for tool in rtmt.tools.values()]
 
@@ -170,32 +385,38 @@ async def create_app():
     # Attach the WebSocket handler to the application.
     rtmt.attach_to_app(app, "/realtime")
 
+    # Prometheus scrape endpoint for relay, tool and retrieval latencies.
+    metrics.attach_to_app(app, "/metrics")
+
     # ==============================================================================
-    # 5. Serve Frontend (No background tasks needed anymore)
+    # 4. Serve Frontend (No background tasks needed anymore)
     # ==============================================================================
     
-    # This path navigates from the current file's directory (backend/) up one level (..),
-    # then down into frontend/ and finally into dist/. This is the correct, robust path.
-    backend_dir = Path(__file__).parent
-    frontend_build_dir = backend_dir.parent / "frontend" / "dist"
-
-    logger.info(f"Configured to serve frontend from: {frontend_build_dir}")
-
-    # This check prevents the server from starting with a broken frontend. It provides a
-    # clear, actionable error if the frontend hasn't been built yet.
-    if not frontend_build_dir.exists() or not (frontend_build_dir / "index.html").exists():
-        error_message = (
-            f"Frontend build directory not found at '{frontend_build_dir}'. "
-            "Please run 'npm install && npm run build' inside the 'frontend' directory."
-        )
-        logger.critical(error_message)
-        raise FileNotFoundError(error_message)
+    if not settings.SERVE_FRONTEND:
+        logger.info("SERVE_FRONTEND is disabled; serving the API only.")
+    else:
+        # This path navigates from the current file's directory (backend/) up one level (..),
+        # then down into frontend/ and finally into dist/. This is the correct, robust path.
+        backend_dir = Path(__file__).parent
+        frontend_build_dir = backend_dir.parent / "frontend" / "dist"
+
+        logger.info(f"Configured to serve frontend from: {frontend_build_dir}")
+
+        # This check prevents the server from starting with a broken frontend. It provides a
+        # clear, actionable error if the frontend hasn't been built yet.
+        if not frontend_build_dir.exists() or not (frontend_build_dir / "index.html").exists():
+            error_message = (
+                f"Frontend build directory not found at '{frontend_build_dir}'. "
+                "Please run 'npm install && npm run build' inside the 'frontend' directory."
+            )
+            logger.critical(error_message)
+            raise FileNotFoundError(error_message)
 
-    # This route serves the main index.html file for any initial visit to the site.
-    app.add_routes([web.get('/', lambda _: web.FileResponse(frontend_build_dir / 'index.html'))])
+        # This route serves the main index.html file for any initial visit to the site.
+        app.add_routes([web.get('/', lambda _: web.FileResponse(frontend_build_dir / 'index.html'))])
 
-    # This route serves all other static assets (JS, CSS, images) from the build directory.
-    app.router.add_static('/', path=frontend_build_dir, name='dist')
+        # This route serves all other static assets (JS, CSS, images) from the build directory.
+        app.router.add_static('/', path=frontend_build_dir, name='dist')
     
     logger.info("Application setup complete. Starting web server...")
     return app
@@ -204,6 +425,6 @@ if __name__ == "__main__":
     print("╔══════════════════════════════════════════════════════════════════╗")
     print("║        Azure GPT-4o-mini RAG Speech-to-Speech Model Starting     ║")
     print("╚══════════════════════════════════════════════════════════════════╝")
-    host = "localhost"
-    port = 8765
+    host = settings.APP_HOST
+    port = settings.APP_PORT
     web.run_app(create_app(), host=host, port=port)
\ No newline at end of file
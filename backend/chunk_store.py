@@ -0,0 +1,151 @@
+import logging
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("voicerag.chunk_store")
+
+# File layout (little-endian):
+#   header: magic (4s) | version (I) | record count (I)
+#   records: id_len (H) | title_len (I) | text_len (I) | id | title | text
+# Strings are UTF-8. The file is memory-mapped read-only at startup and only an
+# id -> (offset, title_len, text_len) index is kept on the Python heap.
+_MAGIC = b"VRCS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sII")
+_RECORD = struct.Struct("<HII")
+
+
+def write_chunk_store(path: Path, records: Iterable[Tuple[str, str, str]]) -> int:
+    """
+    Writes (chunk_id, title, text) records to `path` atomically and returns
+    the number written.
+    """
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, 0))
+        for chunk_id, title, text in records:
+            id_b, title_b, text_b = str(chunk_id).encode(), title.encode(), text.encode()
+            f.write(_RECORD.pack(len(id_b), len(title_b), len(text_b)))
+            f.write(id_b)
+            f.write(title_b)
+            f.write(text_b)
+            count += 1
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, _VERSION, count))
+    os.replace(tmp_path, path)
+    return count
+
+
+def dump_collection(client, collection_name: str, path: Path, batch_size: int = 256) -> int:
+    """
+    Scrolls every point of a Qdrant collection and writes its grounding
+    payload (the `metadata.source` title and page content) to a chunk store.
+    """
+    def _records():
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            for point in points:
+                payload = point.payload or {}
+                title = (payload.get("metadata") or {}).get("source", "Unknown Source")
+                yield str(point.id), str(title), payload.get("page_content", "")
+            if offset is None:
+                break
+
+    return write_chunk_store(path, _records())
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped id -> (title, text) lookup for grounding.
+
+    Built by `ingest.py` from the Qdrant collection, so report_grounding can
+    answer without touching the vector DB. A missing or unreadable file
+    yields an empty store and every lookup falls through to Qdrant.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+
+        if self.path is not None and self.path.exists():
+            try:
+                self._open()
+            except Exception as e:
+                logger.error(f"Failed to load chunk store '{self.path}': {e}")
+                self.close()
+
+    def _open(self) -> None:
+        self._file = open(self.path, "rb")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            raise ValueError("chunk store file is empty")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"unsupported chunk store format (magic={magic!r}, version={version})")
+
+        offset = _HEADER.size
+        for _ in range(count):
+            id_len, title_len, text_len = _RECORD.unpack_from(self._mmap, offset)
+            offset += _RECORD.size
+            chunk_id = self._mmap[offset:offset + id_len].decode()
+            offset += id_len
+            self._index[chunk_id] = (offset, title_len, text_len)
+            offset += title_len + text_len
+        logger.info(f"Loaded chunk store with {len(self._index)} chunks from '{self.path}'.")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._index
+
+    def get(self, chunk_id: str) -> Optional[Tuple[str, str]]:
+        """Returns (title, text) for a chunk, or None if it is not in the store."""
+        entry = self._index.get(chunk_id)
+        if entry is None:
+            return None
+        offset, title_len, text_len = entry
+        title = self._mmap[offset:offset + title_len].decode()
+        text = self._mmap[offset + title_len:offset + title_len + text_len].decode()
+        return title, text
+
+    def items(self) -> Iterator[Tuple[str, str, str]]:
+        """Iterates every (chunk_id, title, text) record in file order."""
+        for chunk_id in self._index:
+            title, text = self.get(chunk_id)
+            yield chunk_id, title, text
+
+    def get_many(self, chunk_ids: Iterable[str]) -> Tuple[Dict[str, Tuple[str, str]], List[str]]:
+        """Splits `chunk_ids` into found {id: (title, text)} entries and missing ids."""
+        found, missing = {}, []
+        for chunk_id in chunk_ids:
+            entry = self.get(chunk_id)
+            if entry is None:
+                missing.append(chunk_id)
+            else:
+                found[chunk_id] = entry
+        return found, missing
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index = {}
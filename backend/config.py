@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -16,10 +18,90 @@ class Settings(BaseSettings):
     AZURE_OPENAI_EMBEDDING_API_VERSION: str
     AZURE_OPENAI_EMBEDDING_BATCH_SIZE: int = 16
     AZURE_OPENAI_VOICE_CHOICE: str = "sage"
+    # Authenticate the realtime connection with AZURE_OPENAI_API_KEY instead of Azure AD.
+    AZURE_OPENAI_REALTIME_USE_API_KEY: bool = False
+
+    # --- Realtime Upstream ---
+    # Pre-opened, pre-configured realtime sockets kept ready for new callers; 0 disables the pool.
+    # Callers sending x-ms-client-request-id always connect directly so the ID reaches the service.
+    UPSTREAM_POOL_SIZE: int = 0
+    UPSTREAM_POOL_MAX_AGE_SECONDS: float = 300.0
+    # Cached Azure AD tokens are refreshed this long before they expire.
+    AAD_TOKEN_REFRESH_MARGIN_SECONDS: float = 300.0
+    # Merge the caller's input audio appends for up to this many milliseconds (or
+    # AUDIO_COALESCE_MAX_BYTES of PCM) before sending upstream; 0 forwards each one.
+    # Adds at most this much delay to the audio Azure's turn detection hears.
+    AUDIO_COALESCE_MS: int = 0
+    AUDIO_COALESCE_MAX_BYTES: int = 19200  # 400 ms of 24 kHz PCM16
+    # Admission control: concurrent calls (0 = unlimited), callers allowed to wait for a
+    # free slot beyond that, and how long they wait before being rejected with a 503.
+    MAX_CONCURRENT_SESSIONS: int = 0
+    MAX_QUEUED_SESSIONS: int = 0
+    SESSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
 
     # --- Qdrant ---
     QDRANT_PATH: str
     QDRANT_COLLECTION_NAME: str
+    # Use a Qdrant server instead of the embedded store at QDRANT_PATH (which only one
+    # process can open). Local files such as the chunk store still live under QDRANT_PATH.
+    QDRANT_URL: str = ""
+    QDRANT_API_KEY: str = ""
+    # Serve searches from the read-only snapshot exported by serve.py; set for its workers.
+    QDRANT_READ_ONLY_SNAPSHOT: bool = False
+    # Threads serving tool-time Qdrant calls, and per-operation timeouts.
+    QDRANT_MAX_WORKERS: int = 4
+    QDRANT_SEARCH_TIMEOUT_SECONDS: float = 2.0
+    QDRANT_RETRIEVE_TIMEOUT_SECONDS: float = 1.0
+    # Written next to the Qdrant data by ingest.py; serves grounding lookups from memory.
+    CHUNK_STORE_FILENAME: str = "chunk_store.bin"
+    LEXICAL_INDEX_FILENAME: str = "lexical_index.json"
+    # Collection storage/index tuning, applied by ingest.py and at search time.
+    QDRANT_QUANTIZATION: str = "none"  # "none", "scalar" (int8) or "binary"
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True
+    QDRANT_QUANTIZATION_RESCORE: bool = True  # re-rank quantized hits with full-precision vectors
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = 2.0
+    QDRANT_HNSW_M: Optional[int] = None
+    QDRANT_HNSW_EF_CONSTRUCT: Optional[int] = None
+    QDRANT_HNSW_EF: Optional[int] = None  # search-time ef
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_ON_DISK_PAYLOAD: bool = False
+
+    # --- Retrieval ---
+    RETRIEVAL_K: int = 1
+    # Minimum cosine similarity for a chunk to be returned; unset returns the top k regardless.
+    RETRIEVAL_SCORE_THRESHOLD: Optional[float] = None
+    RETRIEVAL_USE_MMR: bool = False
+    RETRIEVAL_MMR_FETCH_K: int = 20
+    RETRIEVAL_MMR_LAMBDA: float = 0.5
+    # Hybrid dense + BM25 retrieval fused with reciprocal rank fusion.
+    RETRIEVAL_HYBRID: bool = True
+    RETRIEVAL_HYBRID_CANDIDATES: int = 10  # candidates taken from each ranking before fusion
+    RETRIEVAL_RRF_K: int = 60
+    # How long hybrid search waits for the query embedding before answering lexically.
+    RETRIEVAL_EMBEDDING_BUDGET_MS: int = 800
+
+    # Start SearchInput from the user's transcript as soon as their turn ends and
+    # reuse it if the model's query shares at least this fraction of content words.
+    # Opt-in: it turns on input audio transcription (whisper-1, billed per call)
+    # and runs a search on every user turn.
+    SPECULATIVE_RETRIEVAL: bool = False
+    SPECULATION_MIN_SIMILARITY: float = 0.5
+
+    # --- Query Embedding Cache ---
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # 0 disables the cache
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 86400  # 0 keeps entries until evicted
+    # Optional file the cache is saved to on shutdown and reloaded from at startup.
+    QUERY_EMBEDDING_CACHE_PATH: str = ""  # e.g., "./qdrant_db/query_embedding_cache.json"
+
+    # Approximate token budget for the search tool's evidence; chunks are compressed to
+    # their most query-relevant, non-repeated sentences to fit. 0 sends chunks in full.
+    EVIDENCE_TOKEN_BUDGET: int = 600
+
+    # --- Semantic Evidence Cache ---
+    # Search results reused for later queries whose embedding is at least this
+    # cosine-similar to a cached one; dropped whenever ingest.py updates the collection.
+    EVIDENCE_CACHE_SIZE: int = 256  # 0 disables the cache
+    EVIDENCE_CACHE_MIN_SIMILARITY: float = 0.95
 
     # --- Ingestion ---
     DATA_PATH: str
@@ -28,9 +110,36 @@ class Settings(BaseSettings):
     EMBEDDING_DIMENSIONS: int
     # A comma-separated string of PDF filenames that require special table parsing.
     TABULAR_PDF_FILES: str = ""  # e.g., "product_comparison.pdf,pricing_sheet_v2.pdf"
+    # Processes used to parse documents; 1 parses in-process, 0 uses one per CPU core.
+    INGEST_WORKERS: int = 1
+    # Chunks per embed/upsert batch, and batches buffered between pipeline stages.
+    INGEST_BATCH_SIZE: int = 256
+    INGEST_QUEUE_BATCHES: int = 2
+    # Embedding scheduler: concurrent batches, per-batch token budget and 429/5xx retries.
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_BATCH_MAX_TOKENS: int = 8000
+    EMBEDDING_MAX_RETRIES: int = 8
+    # Disk cache of chunk embeddings reused across re-ingestions; empty disables it.
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache"
+
+    # --- Startup ---
+    # Warm-up search run once the knowledge base is open (empty skips it), and how long
+    # it and the Azure AD token prefetch may take before the app reports ready anyway.
+    WARM_UP_QUERY: str = "What plans and prices are available?"
+    WARM_UP_TIMEOUT_SECONDS: float = 30.0
 
     # --- Application ---
     RUNNING_IN_PRODUCTION: bool = False
+    # Serve the built frontend from frontend/dist; disable for API-only runs such as the load test.
+    SERVE_FRONTEND: bool = True
+    APP_HOST: str = "localhost"
+    APP_PORT: int = 8765
+
+    # --- Multi-process Serving (serve.py) ---
+    # Worker processes sharing APP_PORT via SO_REUSEPORT; 0 uses one per CPU core.
+    WORKERS: int = 0
+    # How long a stopping worker lets in-flight calls finish before closing them.
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS: float = 60.0
     
 # Create a single, reusable instance of the settings
 settings = Settings()
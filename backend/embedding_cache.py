@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("voicerag.embedding_cache")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,;:!?¿¡'\"`"
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a query into a cache key so that trivial variations
+    ("What does Plan E3 cost?" vs. "what does plan e3 cost") share one entry.
+    Only case, unicode form, whitespace and leading/trailing punctuation are
+    folded; the wording itself is left untouched.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _WHITESPACE_RE.sub(" ", text)
+    return text.strip(_EDGE_PUNCTUATION)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model and caches the vectors produced for queries.
+
+    Document embeddings (used by ingestion) pass straight through; only
+    `embed_query`/`aembed_query` are cached. Entries are kept in a bounded
+    LRU with a time-to-live and can optionally be persisted to a JSON file so
+    a restarted server does not start cold.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int = 1024,
+        ttl_seconds: float = 86400,
+        persist_path: Optional[str] = None,
+        model_tag: str = "",
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        # Stored alongside persisted vectors so a cache written for one
+        # deployment is never served for another.
+        self.model_tag = model_tag
+
+        # key -> (created_at wall-clock seconds, vector)
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # --- Cache bookkeeping ---
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            created_at, vector = entry
+            if self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _put(self, key: str, vector: List[float], created_at: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (created_at if created_at is not None else time.time(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit/miss counters and current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # --- Embeddings interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._get(key)
+        if vector is not None:
+            return vector
+
+        # Identical questions arriving at the same time share one request. It runs
+        # as its own task, so a caller that is cancelled (e.g. a speculative search
+        # dropped on barge-in) stops waiting without cancelling it for the others.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._embed_and_cache(key, text))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._request_done(key, t))
+        return await asyncio.shield(task)
+
+    async def _embed_and_cache(self, key: str, text: str) -> List[float]:
+        vector = await self.embeddings.aembed_query(text)
+        self._put(key, vector)
+        return vector
+
+    def _request_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every caller has stopped waiting.
+        if not task.cancelled():
+            task.exception()
+
+    # --- Persistence ---
+
+    def load(self) -> int:
+        """
+        Loads persisted entries from disk, skipping expired ones and any that
+        were written for a different model. Returns the number of entries loaded.
+        """
+        if self.persist_path is None or not self.persist_path.exists():
+            return 0
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable query embedding cache '{self.persist_path}': {e}")
+            return 0
+
+        if data.get("model") != self.model_tag:
+            logger.info("Query embedding cache on disk was written for a different model; starting empty.")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        for key, created_at, vector in data.get("entries", []):
+            if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                continue
+            self._put(key, vector, created_at=created_at)
+            loaded += 1
+        logger.info(f"Loaded {loaded} cached query embeddings from '{self.persist_path}'.")
+        return loaded
+
+    def save(self) -> None:
+        """Writes the current entries to disk atomically, oldest first."""
+        if self.persist_path is None:
+            return
+        with self._lock:
+            entries = [[key, created_at, vector] for key, (created_at, vector) in self._entries.items()]
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temp name: several workers (serve.py) may save at once.
+        tmp_path = self.persist_path.with_suffix(f"{self.persist_path.suffix}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_tag, "entries": entries}, f)
+        os.replace(tmp_path, self.persist_path)
+        logger.info(f"Saved {len(entries)} query embeddings to '{self.persist_path}'.")
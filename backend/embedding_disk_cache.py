@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_SIZE = 32  # sha256
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class DiskEmbeddingCache:
+    """
+    Append-only on-disk cache of document embeddings for re-ingestion.
+
+    Each (deployment, dimensions) pair gets its own directory holding two
+    files that grow in lockstep:
+      - `vectors.f32`: raw float32 rows of `dimensions` values, memory-mapped
+        for reads;
+      - `index.bin`: the sha256 digest of each row's chunk text.
+    The digest index is loaded into a dict at open, so a lookup is one hash
+    probe plus a slice of the memory map. Rows are only ever appended, and a
+    torn final row from an interrupted run is ignored on the next open.
+    """
+
+    def __init__(self, root: Path, deployment: str, dimensions: int):
+        self.dimensions = dimensions
+        safe_deployment = "".join(c if c.isalnum() or c in "-_." else "_" for c in deployment)
+        self.directory = Path(root) / f"{safe_deployment}-{dimensions}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.index_path = self.directory / "index.bin"
+        self._row_bytes = dimensions * 4
+
+        self._index: Dict[bytes, int] = {}
+        self._mmap: Optional[np.memmap] = None
+        self._load()
+
+    def _load(self) -> None:
+        digests = self.index_path.read_bytes() if self.index_path.exists() else b""
+        vector_bytes = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        rows = min(len(digests) // _DIGEST_SIZE, vector_bytes // self._row_bytes)
+
+        # Drop any partial trailing row left by a crash so both files line up again.
+        if len(digests) != rows * _DIGEST_SIZE:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(rows * _DIGEST_SIZE)
+        if vector_bytes != rows * self._row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(rows * self._row_bytes)
+
+        self._index = {digests[i * _DIGEST_SIZE:(i + 1) * _DIGEST_SIZE]: i for i in range(rows)}
+        self._remap(rows)
+        logger.info(f"Embedding cache '{self.directory}' holds {rows} vectors.")
+
+    def _remap(self, rows: int) -> None:
+        self._mmap = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimensions))
+            if rows else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Returns the cached vector for each text, or None where it is missing."""
+        results: List[Optional[List[float]]] = []
+        for text in texts:
+            row = self._index.get(text_digest(text))
+            results.append(self._mmap[row].tolist() if row is not None else None)
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Appends vectors for texts not already cached."""
+        new_digests, new_rows = [], []
+        for text, vector in zip(texts, vectors):
+            digest = text_digest(text)
+            if digest in self._index or len(vector) != self.dimensions:
+                continue
+            self._index[digest] = len(self._index)
+            new_digests.append(digest)
+            new_rows.append(vector)
+        if not new_rows:
+            return
+
+        # Vectors are written first: a crash in between leaves an unindexed row,
+        # which _load trims, rather than a digest pointing at nothing.
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.asarray(new_rows, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_path, "ab") as f:
+            f.write(b"".join(new_digests))
+        self._remap(len(self._index))
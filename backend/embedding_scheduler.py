@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, List, Optional
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncAzureOpenAI, RateLimitError
+
+from embedding_disk_cache import DiskEmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Hard per-request input limit of the Azure OpenAI embeddings API.
+MAX_INPUTS_PER_REQUEST = 2048
+
+
+def _load_token_counter() -> Callable[[str], int]:
+    """
+    Returns a function that counts tokens with tiktoken when it is installed
+    (it ships with langchain-openai) and a ~4 characters/token estimate otherwise.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        return lambda text: max(1, len(text) // 4)
+
+
+def _retry_after_seconds(error: APIStatusError) -> Optional[float]:
+    """Reads the server's requested delay from a throttled response, if any."""
+    headers = error.response.headers if error.response is not None else {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return float(value) * scale
+        except ValueError:
+            continue
+    return None
+
+
+class EmbeddingScheduler:
+    """
+    Embeds large text collections for ingestion as fast as the deployment's
+    quota allows.
+
+    Texts are packed into batches by token budget (not a fixed count), up to
+    `max_concurrency` batches are in flight at once, and throttled (429) or
+    transient failures are retried with exponential backoff that honors the
+    service's `Retry-After` headers. Progress and throughput are logged as
+    batches complete. With a DiskEmbeddingCache attached, cached texts never
+    reach the network and each finished batch is written to the cache.
+    """
+
+    def __init__(
+        self,
+        client: AsyncAzureOpenAI,
+        deployment: str,
+        max_concurrency: int = 4,
+        max_batch_tokens: int = 8000,
+        max_retries: int = 8,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        progress_interval: float = 5.0,
+        cache: Optional[DiskEmbeddingCache] = None,
+    ):
+        self.client = client
+        self.deployment = deployment
+        self.max_concurrency = max_concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.progress_interval = progress_interval
+        self.cache = cache
+        self.count_tokens = _load_token_counter()
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Groups text indices into batches that stay within the token budget."""
+        batches, current, current_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= MAX_INPUTS_PER_REQUEST):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.embeddings.create(model=self.deployment, input=batch)
+                return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+            except (RateLimitError, APIStatusError, APIConnectionError, APITimeoutError) as e:
+                retryable = isinstance(e, (RateLimitError, APIConnectionError, APITimeoutError)) or (
+                    isinstance(e, APIStatusError) and e.status_code >= 500
+                )
+                attempt += 1
+                if not retryable or attempt > self.max_retries:
+                    raise
+                delay = _retry_after_seconds(e) if isinstance(e, APIStatusError) else None
+                if delay is None:
+                    delay = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+                    delay *= 0.5 + random.random() / 2
+                logger.warning(f"Embedding batch failed ({type(e).__name__}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds `texts`, returning vectors in the same order."""
+        if not texts:
+            return []
+
+        vectors: List[Optional[List[float]]] = self.cache.get_many(texts) if self.cache is not None else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if self.cache is not None:
+            logger.info(f"Embedding cache hit for {len(texts) - len(missing)}/{len(texts)} texts.")
+        if not missing:
+            return vectors
+
+        texts = [texts[i] for i in missing]
+        batches = self.make_batches(texts)
+        fresh: List[Optional[List[float]]] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        total_tokens = sum(self.count_tokens(t) for t in texts)
+        done_texts = done_tokens = 0
+        started = last_report = time.monotonic()
+
+        logger.info(f"Embedding {len(texts)} texts (~{total_tokens} tokens) in {len(batches)} batches, {self.max_concurrency} concurrent.")
+
+        async def _run(batch: List[int]) -> None:
+            nonlocal done_texts, done_tokens, last_report
+            async with semaphore:
+                result = await self._embed_batch([texts[i] for i in batch])
+            for i, vector in zip(batch, result):
+                fresh[i] = vector
+            if self.cache is not None:
+                self.cache.put_many([texts[i] for i in batch], result)
+            done_texts += len(batch)
+            done_tokens += sum(self.count_tokens(texts[i]) for i in batch)
+            now = time.monotonic()
+            if now - last_report >= self.progress_interval or done_texts == len(texts):
+                last_report = now
+                elapsed = max(now - started, 1e-6)
+                logger.info(
+                    f"  Embedded {done_texts}/{len(texts)} texts "
+                    f"({done_texts / elapsed:.1f} texts/s, {done_tokens / elapsed:.0f} tokens/s)"
+                )
+
+        await asyncio.gather(*(_run(batch) for batch in batches))
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+        return vectors
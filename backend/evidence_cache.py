@@ -0,0 +1,185 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from metrics import EVIDENCE_CACHE_LOOKUPS_TOTAL
+
+logger = logging.getLogger("voicerag.evidence_cache")
+
+# Rewritten by ingest.py whenever it changes the collection; running servers
+# watch its modification time to drop evidence built from the old data.
+COLLECTION_VERSION_FILENAME = "collection_version"
+
+
+def mark_collection_updated(root: Path) -> None:
+    """Records that the collection under `root` has changed."""
+    path = Path(root) / COLLECTION_VERSION_FILENAME
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(str(time.time_ns()), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _collection_version(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class CollectionVersionWatcher:
+    """
+    Notices when ingest.py has changed the collection, by polling the
+    modification time of the version file at most every `check_interval`
+    seconds.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 5.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._version = _collection_version(self.path)
+        self._checked_at = time.monotonic()
+
+    def changed(self) -> bool:
+        """True once per change since the previous call that returned True."""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = time.monotonic()
+        version = _collection_version(self.path)
+        if version == self._version:
+            return False
+        self._version = version
+        return True
+
+
+class SemanticEvidenceCache:
+    """
+    Caches the formatted search evidence by query embedding.
+
+    Callers phrase the same question in many ways ("how much is plan E3",
+    "what does E3 cost"), and those phrasings embed close to one another. A
+    lookup returns the evidence stored for the most similar cached query if
+    their cosine similarity is at least `min_similarity`, so near-duplicate
+    questions skip the search entirely.
+
+    Entries live in a bounded LRU. Vectors are kept unit-length in one
+    preallocated matrix, so a lookup is a single matrix-vector product. The
+    whole cache is dropped when the collection version file written by
+    ingest.py changes (checked at most every `check_interval` seconds).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        min_similarity: float = 0.95,
+        version_path: Optional[Path] = None,
+        check_interval: float = 5.0,
+    ):
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._watcher = CollectionVersionWatcher(version_path, check_interval) if version_path else None
+
+        # slot -> evidence, least recently used first; slots index rows of _vectors.
+        self._entries: "OrderedDict[int, str]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._live: Optional[np.ndarray] = None
+        self._free: List[int] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # --- Invalidation ---
+
+    def _check_version(self) -> None:
+        if self._watcher is None or not self._watcher.changed():
+            return
+        if self._entries:
+            logger.info(f"Collection was updated; dropping {len(self._entries)} cached evidence entries.")
+            self.invalidations += 1
+        self.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vectors = None
+        self._live = None
+        self._free = []
+
+    # --- Lookup and Store ---
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def get(self, query_vector: Sequence[float]) -> Optional[str]:
+        """Returns the evidence cached for the nearest past query, if it is similar enough."""
+        if not self.enabled:
+            return None
+        self._check_version()
+        if not self._entries:
+            return self._miss()
+        query = self._unit(query_vector)
+        if query.shape[0] != self._vectors.shape[1]:
+            return self._miss()
+
+        scores = self._vectors @ query
+        scores[~self._live] = -np.inf
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.min_similarity:
+            return self._miss()
+        self._entries.move_to_end(slot)
+        self.hits += 1
+        EVIDENCE_CACHE_LOOKUPS_TOTAL.inc(1, "hit")
+        return self._entries[slot]
+
+    def _miss(self) -> None:
+        self.misses += 1
+        EVIDENCE_CACHE_LOOKUPS_TOTAL.inc(1, "miss")
+        return None
+
+    def put(self, query_vector: Sequence[float], evidence: str) -> None:
+        if not self.enabled:
+            return
+        self._check_version()
+        vector = self._unit(query_vector)
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self.clear()
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._live = np.zeros(self.max_entries, dtype=bool)
+            self._free = list(range(self.max_entries - 1, -1, -1))
+
+        if not self._free:
+            slot, _ = self._entries.popitem(last=False)
+            self._live[slot] = False
+            self._free.append(slot)
+            self.evictions += 1
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        self._live[slot] = True
+        self._entries[slot] = evidence
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit/miss counters and current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
@@ -0,0 +1,141 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+from langchain_core.documents import Document
+
+from lexical_index import tokenize
+
+# Sentence ends, and line breaks (table rows and list items are one "sentence" each).
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[*-])|\s*\n+\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Roughly how many characters one model token covers in English prose.
+CHARS_PER_TOKEN = 4
+# Sentences sharing at least this fraction of their terms with an already
+# selected sentence are treated as repeats (overlapping chunks, boilerplate).
+# Shorter sentences only count as repeats when identical.
+NEAR_DUPLICATE_OVERLAP = 0.8
+NEAR_DUPLICATE_MIN_TERMS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; avoids loading a tokenizer on the tool's hot path."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s and s.strip()]
+
+
+def _is_heading(sentence: str) -> bool:
+    # Markdown headings such as the "### Product: ..." line of pricing-table chunks.
+    return sentence.startswith("#")
+
+
+class _Sentence:
+    __slots__ = ("doc_index", "position", "text", "context", "terms", "tokens", "score")
+
+    def __init__(self, doc_index: int, position: int, text: str, context: str = ""):
+        self.doc_index = doc_index
+        self.position = position
+        self.text = text
+        # The chunk's heading: identical rows under different products are not repeats.
+        self.context = context
+        self.terms: Set[str] = set(tokenize(text))
+        self.tokens = estimate_tokens(text)
+        self.score = 0.0
+
+    def repeats(self, other: "_Sentence") -> bool:
+        if self.context != other.context:
+            return False
+        smaller = min(len(self.terms), len(other.terms))
+        return smaller >= NEAR_DUPLICATE_MIN_TERMS and len(self.terms & other.terms) >= NEAR_DUPLICATE_OVERLAP * smaller
+
+
+def compress_evidence(query: str, docs: List[Document], token_budget: int) -> List[Tuple[Document, str]]:
+    """
+    Shrinks retrieved chunks to at most `token_budget` (estimated) tokens by
+    extractive, query-aware sentence selection.
+
+    Sentences are scored by the query terms they contain, weighted by how
+    rare each term is among the candidates, with a small bonus for chunks
+    that ranked higher. They are then picked best first while they fit,
+    skipping sentences that repeat one already picked (exactly or
+    near-exactly, as happens with overlapping chunks). A chunk's heading is
+    kept with any sentence picked from it so that e.g. a price still names
+    its product. Picked sentences keep their original order.
+
+    Returns `(document, compressed_text)` pairs in retrieval order; chunks
+    with nothing selected are left out. When everything fits the budget, and
+    for any chunk whose every sentence is picked, the original text is
+    returned as is, keeping its table and list formatting.
+    """
+    if sum(estimate_tokens(doc.page_content) for doc in docs) <= token_budget:
+        return [(doc, doc.page_content) for doc in docs]
+
+    sentences: List[_Sentence] = []
+    headings: Dict[int, _Sentence] = {}
+    sentence_counts: Dict[int, int] = {}
+    for doc_index, doc in enumerate(docs):
+        parts = split_sentences(doc.page_content)
+        sentence_counts[doc_index] = len(parts)
+        context = ""
+        if parts and _is_heading(parts[0]):
+            headings[doc_index] = _Sentence(doc_index, 0, parts[0])
+            context = _WHITESPACE_RE.sub(" ", parts[0].casefold())
+        for position, text in enumerate(parts):
+            if position > 0 or doc_index not in headings:
+                sentences.append(_Sentence(doc_index, position, text, context))
+
+    document_frequency = Counter(term for s in sentences for term in s.terms)
+    query_terms = set(tokenize(query))
+    for s in sentences:
+        matched = s.terms & query_terms
+        relevance = sum(math.log(1 + len(sentences) / document_frequency[t]) for t in matched)
+        # Scaled by length so a long sentence does not win on one common term.
+        s.score = relevance / math.sqrt(max(1, len(s.terms))) + 0.1 / (1 + s.doc_index)
+
+    selected: List[_Sentence] = []
+    picked: List[_Sentence] = []
+    seen_texts: Set[Tuple[str, str]] = set()
+    used_headings: Set[int] = set()
+    truncated_docs: Set[int] = set()
+    remaining = token_budget
+    for s in sorted(sentences, key=lambda s: (-s.score, s.doc_index, s.position)):
+        key = (s.context, _WHITESPACE_RE.sub(" ", s.text.casefold()))
+        if key in seen_texts or any(s.repeats(other) for other in picked):
+            continue
+
+        heading = headings.get(s.doc_index) if s.doc_index not in used_headings else None
+        cost = s.tokens + (heading.tokens if heading is not None else 0)
+        if cost > remaining:
+            if selected:
+                continue
+            # Nothing fits yet: keep a truncated best sentence rather than no evidence at all.
+            s.text = s.text[: max(0, remaining - (heading.tokens if heading is not None else 0)) * CHARS_PER_TOKEN]
+            cost = remaining
+            if not s.text:
+                continue
+            truncated_docs.add(s.doc_index)
+        seen_texts.add(key)
+        picked.append(s)
+        selected.append(s)
+        if heading is not None:
+            used_headings.add(s.doc_index)
+            selected.append(heading)
+        remaining -= cost
+        if remaining <= 0:
+            break
+
+    by_doc: Dict[int, List[_Sentence]] = {}
+    for s in selected:
+        by_doc.setdefault(s.doc_index, []).append(s)
+    passages = []
+    for doc_index, doc_sentences in sorted(by_doc.items()):
+        doc = docs[doc_index]
+        if len(doc_sentences) == sentence_counts[doc_index] and doc_index not in truncated_docs:
+            passages.append((doc, doc.page_content))
+        else:
+            passages.append((doc, "\n".join(s.text for s in sorted(doc_sentences, key=lambda s: s.position))))
+    return passages
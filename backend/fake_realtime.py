@@ -0,0 +1,236 @@
+import asyncio
+import base64
+import json
+import logging
+import struct
+import time
+import uuid
+from typing import List, Optional
+
+from aiohttp import web
+
+from local_embeddings import HashEmbeddings
+
+logger = logging.getLogger("voicerag.fake_realtime")
+
+# 100 ms of 24 kHz mono PCM16 silence, the format the realtime API streams.
+SILENCE_100MS = base64.b64encode(bytes(4800)).decode()
+
+
+# ==============================================================================
+# Scripted Conversation
+# ==============================================================================
+
+class RealtimeScript:
+    """
+    What the fake service does on every committed user turn.
+
+    Turn `i` transcribes to `queries[i % len(queries)]`. Every `tool_every`-th
+    turn (0 disables tools) the model first calls `tool_name` with that
+    query and only speaks once the tool output and `response.create` arrive;
+    other turns are answered straight away. An answer is `response_deltas`
+    audio deltas, `delta_interval` seconds apart.
+    """
+
+    def __init__(
+        self,
+        queries: List[str],
+        tool_every: int = 2,
+        tool_name: str = "SearchInput",
+        response_deltas: int = 20,
+        delta_interval: float = 0.005,
+        audio_delta: str = SILENCE_100MS,
+    ):
+        self.queries = queries
+        self.tool_every = tool_every
+        self.tool_name = tool_name
+        self.response_deltas = response_deltas
+        self.delta_interval = delta_interval
+        self.audio_delta = audio_delta
+
+    def query(self, turn: int) -> str:
+        return self.queries[turn % len(self.queries)]
+
+    def uses_tool(self, turn: int) -> bool:
+        return self.tool_every > 0 and turn % self.tool_every == 0
+
+
+def stamp_event_id() -> str:
+    """An event id carrying the send time, so receivers can measure delivery latency."""
+    return f"evt_{time.perf_counter_ns()}"
+
+
+def event_sent_ns(event: dict) -> Optional[int]:
+    """Reads the send time back out of an id produced by `stamp_event_id`."""
+    event_id = event.get("event_id") or ""
+    if event_id.startswith("evt_"):
+        try:
+            return int(event_id[4:])
+        except ValueError:
+            return None
+    return None
+
+
+# ==============================================================================
+# Fake Azure OpenAI Service
+# ==============================================================================
+
+class FakeRealtimeServer:
+    """
+    Local aiohttp stand-in for the Azure OpenAI endpoints the app talks to:
+    `/openai/realtime` (replaying a RealtimeScript) and the embeddings
+    deployment (answered with HashEmbeddings), so the whole app can run
+    offline. Tool round-trip times seen from the service side are collected
+    in `tool_latencies` (seconds), and audio appends received in `audio_appends`.
+    """
+
+    def __init__(self, script: RealtimeScript, embedding_dimensions: int = 256):
+        self.script = script
+        self.embeddings = HashEmbeddings(embedding_dimensions)
+        self.tool_latencies: List[float] = []
+        self.sessions = 0
+        self.errors = 0
+        self.audio_appends = 0
+        self.app = web.Application()
+        self.app.router.add_get("/openai/realtime", self._realtime_handler)
+        self.app.router.add_post("/openai/deployments/{deployment}/embeddings", self._embeddings_handler)
+        self._runner: Optional[web.AppRunner] = None
+        self._detokenize = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving and returns the base URL to use as the Azure endpoint."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # --- Embeddings ---
+
+    def _as_text(self, item) -> str:
+        # langchain-openai may send pre-tokenized input (lists of token ids).
+        if isinstance(item, str):
+            return item
+        if self._detokenize is None:
+            try:
+                import tiktoken
+                self._detokenize = tiktoken.get_encoding("cl100k_base").decode
+            except Exception:
+                self._detokenize = lambda ids: " ".join(str(i) for i in ids)
+        return self._detokenize(item)
+
+    async def _embeddings_handler(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        for index, item in enumerate(inputs):
+            vector = self.embeddings.embed(self._as_text(item))
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return web.json_response({
+            "object": "list",
+            "data": data,
+            "model": request.match_info["deployment"],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    # --- Realtime ---
+
+    async def _realtime_handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sessions += 1
+        try:
+            await self._converse(ws)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Fake realtime session failed: {e}", exc_info=True)
+        return ws
+
+    async def _send(self, ws: web.WebSocketResponse, event: dict) -> None:
+        event.setdefault("event_id", stamp_event_id())
+        await ws.send_str(json.dumps(event))
+
+    async def _converse(self, ws: web.WebSocketResponse) -> None:
+        session_id = f"sess_{uuid.uuid4().hex[:12]}"
+        await self._send(ws, {"type": "session.created", "session": {"id": session_id, "modalities": ["text", "audio"]}})
+
+        turn = 0
+        speaking = False
+        awaiting_tool: Optional[dict] = None
+        async for msg in ws:
+            event = json.loads(msg.data)
+            match event.get("type"):
+                case "session.update":
+                    await self._send(ws, {"type": "session.updated", "session": {"id": session_id, **event.get("session", {})}})
+                case "input_audio_buffer.append":
+                    self.audio_appends += 1
+                    if not speaking:
+                        speaking = True
+                        await self._send(ws, {"type": "input_audio_buffer.speech_started", "audio_start_ms": 0, "item_id": f"item_{turn}_user"})
+                case "input_audio_buffer.commit":
+                    speaking = False
+                    awaiting_tool = await self._user_turn(ws, turn)
+                    turn += 1
+                case "conversation.item.create":
+                    item = event.get("item", {})
+                    if awaiting_tool is not None and item.get("call_id") == awaiting_tool["call_id"]:
+                        self.tool_latencies.append(time.perf_counter() - awaiting_tool["sent_at"])
+                        awaiting_tool["answered"] = True
+                case "response.create":
+                    if awaiting_tool is not None and awaiting_tool.get("answered"):
+                        awaiting_tool = None
+                        await self._speak(ws, turn - 1)
+
+    async def _user_turn(self, ws: web.WebSocketResponse, turn: int) -> Optional[dict]:
+        user_item = f"item_{turn}_user"
+        query = self.script.query(turn)
+        await self._send(ws, {"type": "input_audio_buffer.speech_stopped", "audio_end_ms": 1000, "item_id": user_item})
+        await self._send(ws, {"type": "input_audio_buffer.committed", "previous_item_id": None, "item_id": user_item})
+        await self._send(ws, {"type": "conversation.item.created", "previous_item_id": None, "item": {"id": user_item, "type": "message", "role": "user", "content": [{"type": "input_audio"}]}})
+        await self._send(ws, {"type": "conversation.item.input_audio_transcription.completed", "item_id": user_item, "content_index": 0, "transcript": query})
+
+        if not self.script.uses_tool(turn):
+            await self._speak(ws, turn)
+            return None
+
+        response_id = f"resp_{turn}_tool"
+        call_id = f"call_{turn}"
+        item = {
+            "id": f"item_{turn}_call",
+            "type": "function_call",
+            "status": "completed",
+            "name": self.script.tool_name,
+            "call_id": call_id,
+            "arguments": json.dumps({"query": query}),
+        }
+        await self._send(ws, {"type": "response.created", "response": {"id": response_id, "status": "in_progress", "output": []}})
+        await self._send(ws, {"type": "response.output_item.added", "response_id": response_id, "output_index": 0, "item": {**item, "status": "in_progress", "arguments": ""}})
+        await self._send(ws, {"type": "conversation.item.created", "previous_item_id": user_item, "item": {**item, "status": "in_progress", "arguments": ""}})
+        await self._send(ws, {"type": "response.function_call_arguments.delta", "response_id": response_id, "item_id": item["id"], "call_id": call_id, "delta": item["arguments"]})
+        await self._send(ws, {"type": "response.function_call_arguments.done", "response_id": response_id, "item_id": item["id"], "call_id": call_id, "arguments": item["arguments"]})
+        sent_at = time.perf_counter()
+        await self._send(ws, {"type": "response.output_item.done", "response_id": response_id, "output_index": 0, "item": item})
+        await self._send(ws, {"type": "response.done", "response": {"id": response_id, "status": "completed", "output": [item]}})
+        return {"call_id": call_id, "sent_at": sent_at}
+
+    async def _speak(self, ws: web.WebSocketResponse, turn: int) -> None:
+        response_id = f"resp_{turn}_audio"
+        item_id = f"item_{turn}_assistant"
+        await self._send(ws, {"type": "response.created", "response": {"id": response_id, "status": "in_progress", "output": []}})
+        await self._send(ws, {"type": "response.output_item.added", "response_id": response_id, "output_index": 0, "item": {"id": item_id, "type": "message", "role": "assistant", "content": []}})
+        for _ in range(self.script.response_deltas):
+            await self._send(ws, {"type": "response.audio.delta", "response_id": response_id, "item_id": item_id, "output_index": 0, "content_index": 0, "delta": self.script.audio_delta})
+            await asyncio.sleep(self.script.delta_interval)
+        await self._send(ws, {"type": "response.audio.done", "response_id": response_id, "item_id": item_id, "output_index": 0, "content_index": 0})
+        await self._send(ws, {"type": "response.done", "response": {"id": response_id, "status": "completed", "output": [{"id": item_id, "type": "message", "role": "assistant"}]}})
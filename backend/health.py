@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger("voicerag.health")
+
+
+class Readiness:
+    """
+    Liveness and readiness of the app, for load balancers and orchestrators.
+
+    The server starts listening before it has warmed up. `/healthz` answers
+    200 straight away (and 500 once warm-up has failed for good, so the
+    process gets restarted); `/readyz` answers 503 until warm-up has
+    finished, and so do the `gated_paths` (e.g. /realtime), so no caller is
+    admitted to a cold server.
+    """
+
+    def __init__(self, gated_paths: Iterable[str] = ()):
+        self.gated_paths = frozenset(gated_paths)
+        self.started_at = time.monotonic()
+        # Warm-up phase -> seconds it took.
+        self.phases: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready = False
+        self._done = asyncio.Event()
+
+    # --- State ---
+
+    def phase(self, name: str) -> "_Phase":
+        """Context manager timing one warm-up phase."""
+        return _Phase(self, name)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self._done.set()
+        logger.info(f"Ready after {time.monotonic() - self.started_at:.2f}s (warm-up phases: {self._phase_summary()}).")
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        self._done.set()
+        logger.critical(f"Warm-up failed; the app will not become ready: {error}")
+
+    async def wait(self) -> bool:
+        """Waits for warm-up to end; returns True if the app became ready."""
+        await self._done.wait()
+        return self.ready
+
+    def _phase_summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items()) or "none"
+
+    # --- HTTP ---
+
+    async def _healthz(self, request: web.Request) -> web.Response:
+        status = 500 if self.error is not None else 200
+        return web.json_response({"status": "failed" if status == 500 else "ok"}, status=status)
+
+    async def _readyz(self, request: web.Request) -> web.Response:
+        body = {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "warm_up_seconds": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+        if self.error is not None:
+            body["error"] = self.error
+        return web.json_response(body, status=200 if self.ready else 503)
+
+    @web.middleware
+    async def _gate(self, request: web.Request, handler):
+        if not self.ready and request.path in self.gated_paths:
+            return web.Response(status=503, text="Server is warming up, please try again shortly.", headers={"Retry-After": "5"})
+        return await handler(request)
+
+    def attach_to_app(self, app: web.Application, health_path: str = "/healthz", ready_path: str = "/readyz") -> None:
+        app.router.add_get(health_path, self._healthz)
+        app.router.add_get(ready_path, self._readyz)
+        app.middlewares.append(self._gate)
+
+
+class _Phase:
+    def __init__(self, readiness: Readiness, name: str):
+        self.readiness = readiness
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.readiness.phases[self.name] = time.perf_counter() - self._start
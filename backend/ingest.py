@@ -1,8 +1,16 @@
 import os
+import asyncio
 import json
+import hashlib
 import logging
 import sys
+import uuid
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 from io import StringIO 
 
 # --- LangChain Document Loaders ---
@@ -13,10 +21,16 @@ from langchain_community.document_loaders import (
     TextLoader,
 )
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from openai import AsyncAzureOpenAI
 from qdrant_client import QdrantClient, models
 
+from chunk_store import ChunkStore, dump_collection
+from embedding_disk_cache import DiskEmbeddingCache
+from embedding_scheduler import EmbeddingScheduler
+from evidence_cache import mark_collection_updated
+from lexical_index import BM25Index
+from qdrant_access import apply_collection_tuning, build_collection_kwargs, open_qdrant_client
+
 # --- Specialized PDF Table Parsing ---
 from unstructured.partition.pdf import partition_pdf
 import pandas as pd
@@ -96,55 +110,363 @@ def load_and_process_pricing_table(file_path: str) -> list[Document]:
         logger.error(f"Failed to process the pricing table PDF '{Path(file_path).name}': {e}", exc_info=True)
         return []
 
-def load_and_chunk_documents(
-    files_to_process: list[str],
-    text_splitter: RecursiveCharacterTextSplitter,
-    tabular_pdf_names: list[str]
-) -> list[Document]:
+class FileLoadError(Exception):
+    """Raised inside a document stream when a file fails partway through loading."""
+
+
+def iter_generic_document(file_path_str: str) -> Iterator[Document]:
     """
-    Loads files, routing them to a specialized table parser or a generic
-    loader/splitter based on the configured list of tabular PDF names.
+    Lazily loads one file page by page with the LangChain loader registered
+    for its extension. Yields nothing for unsupported types; raises
+    FileLoadError if the loader fails so the file is not marked as indexed.
     """
-    final_chunks = []
-    
-    special_files = [f for f in files_to_process if Path(f).name in tabular_pdf_names]
-    generic_files = [f for f in files_to_process if Path(f).name not in tabular_pdf_names]
-
-    if special_files:
-        logger.info(f"Found {len(special_files)} special document(s) for table parsing: {', '.join(Path(f).name for f in special_files)}")
-        for file_path_str in special_files:
-            table_chunks = load_and_process_pricing_table(file_path_str)
-            final_chunks.extend(table_chunks)
-
-    if generic_files:
-        logger.info(f"Loading {len(generic_files)} generic document(s) for standard processing...")
-        loaded_generic_docs = []
-        for file_path_str in generic_files:
-            file_path = Path(file_path_str)
-            file_ext = file_path.suffix.lower()
-            if file_ext in LOADER_MAPPING:
-                loader_class = LOADER_MAPPING[file_ext]
-                logger.info(f"-> Loading '{file_path.name}' with {loader_class.__name__}")
+    file_path = Path(file_path_str)
+    file_ext = file_path.suffix.lower()
+    if file_ext not in LOADER_MAPPING:
+        logger.warning(f"  - Skipping '{file_path.name}': unsupported file type '{file_ext}'.")
+        return
+    loader_class = LOADER_MAPPING[file_ext]
+    logger.info(f"-> Loading '{file_path.name}' with {loader_class.__name__}")
+    try:
+        loader = loader_class(str(file_path))
+        yield from loader.lazy_load()
+    except Exception as e:
+        logger.error(f"  - Failed to load generic file '{file_path.name}': {e}")
+        raise FileLoadError(file_path.name) from e
+
+
+def _load_file_task(file_path_str: str, is_tabular: bool) -> list[Document]:
+    """Top-level (picklable) unit of work for the ingestion process pool."""
+    if is_tabular:
+        docs = load_and_process_pricing_table(file_path_str)
+        if not docs:
+            raise FileLoadError(Path(file_path_str).name)
+        return docs
+    return list(iter_generic_document(file_path_str))
+
+
+def iter_loaded_files(file_paths: list[str], tabular_pdf_names: list[str], workers: int = 1) -> Iterator[tuple[str, Optional[Iterable[Document]]]]:
+    """
+    Yields (file path, documents) for each file in `file_paths` order.
+
+    In-process (`workers` <= 1) generic files are streamed page by page. With
+    a process pool, each worker parses a whole file, and at most `2 * workers`
+    files are in flight so memory stays bounded while the slow loaders
+    (notably the hi_res table parser) scale with CPU cores. A file that fails
+    up front yields None in place of its documents; a streamed file that fails
+    partway raises FileLoadError from its iterator. Either way the other
+    files are unaffected.
+    """
+    if workers <= 1 or len(file_paths) <= 1:
+        for f in file_paths:
+            if Path(f).name in tabular_pdf_names:
                 try:
-                    loader = loader_class(str(file_path))
-                    loaded_generic_docs.extend(loader.load())
-                except Exception as e:
-                    logger.error(f"  - Failed to load generic file '{file_path.name}': {e}")
+                    yield f, _load_file_task(f, True)
+                except FileLoadError:
+                    yield f, None
             else:
-                logger.warning(f"  - Skipping '{file_path.name}': unsupported file type '{file_ext}'.")
-        
-        if loaded_generic_docs:
-            logger.info("Applying text splitter to generic documents...")
-            generic_chunks = text_splitter.split_documents(loaded_generic_docs)
-            final_chunks.extend(generic_chunks)
-            logger.info(f"Split generic documents into {len(generic_chunks)} text chunks.")
+                yield f, iter_generic_document(f)
+        return
+
+    logger.info(f"Parsing {len(file_paths)} file(s) with {workers} worker processes...")
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: deque = deque()
+        remaining = iter(file_paths)
+        for f in remaining:
+            pending.append((f, executor.submit(_load_file_task, f, Path(f).name in tabular_pdf_names)))
+            if len(pending) >= window:
+                break
+        while pending:
+            f, future = pending.popleft()
+            try:
+                docs = future.result()
+            except Exception as e:
+                if not isinstance(e, FileLoadError):
+                    logger.error(f"  - Worker failed while loading '{Path(f).name}': {e}")
+                docs = None
+            next_file = next(remaining, None)
+            if next_file is not None:
+                pending.append((next_file, executor.submit(_load_file_task, next_file, Path(next_file).name in tabular_pdf_names)))
+            yield f, docs
+
+
+# ==============================================================================
+# 3. INCREMENTAL INDEXING: Manifest & Deterministic Point IDs
+# ==============================================================================
+
+MANIFEST_VERSION = 2
+# Fixed namespace so the same chunk always maps to the same Qdrant point ID.
+POINT_ID_NAMESPACE = uuid.UUID("6f1c0a4e-2d1b-5b8e-9a57-3c4d8e2f7b10")
+
+
+def file_sha256(file_path: Path) -> str:
+    """Hashes a file's content in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_point_id(file_key: str, index: int, doc: Document) -> str:
+    """
+    Derives a stable point ID from the file, the chunk's position and its
+    content (text and metadata). Re-ingesting an unchanged chunk produces the
+    same ID, so upserts are idempotent and unchanged chunks can be skipped.
+    """
+    content = doc.page_content + "\x00" + json.dumps(doc.metadata, sort_keys=True, default=str)
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{file_key}#{index}#{content_hash}"))
+
+
+def load_manifest(manifest_path: Path) -> dict[str, dict]:
+    """
+    Loads the per-file manifest: {file path: {sha256, mtime, size, point_ids}}.
+    The legacy format (a plain list of paths) is upgraded with
+    `point_ids = None`, meaning the file's points must be found by payload.
+    """
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        logger.info("Upgrading legacy path-only manifest; listed files will be re-indexed once.")
+        return {path: {"sha256": None, "mtime": None, "size": None, "point_ids": None} for path in data}
+    return data.get("files", {})
+
+
+def save_manifest(manifest_path: Path, files: dict[str, dict]) -> None:
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def detect_changes(manifest: dict[str, dict], source_files: list[str]) -> tuple[dict[str, str], list[str], dict[str, dict]]:
+    """
+    Compares the files on disk with the manifest. A file whose mtime and size
+    match its entry is trusted without hashing; otherwise its content hash
+    decides. Returns ({changed or new file: sha256}, removed files, refreshed
+    entries for unchanged files).
+    """
+    changed, unchanged = {}, {}
+    for path in source_files:
+        stat = Path(path).stat()
+        entry = manifest.get(path)
+        if entry and entry.get("point_ids") is not None \
+                and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            unchanged[path] = entry
+            continue
+        sha256 = file_sha256(Path(path))
+        if entry and entry.get("point_ids") is not None and entry.get("sha256") == sha256:
+            # Touched but not modified: keep the points, refresh the stat info.
+            unchanged[path] = {**entry, "mtime": stat.st_mtime, "size": stat.st_size}
+            continue
+        changed[path] = sha256
+    removed = sorted(set(manifest) - set(source_files))
+    return changed, removed, unchanged
+
+
+def delete_file_points(client: QdrantClient, path: str, entry: dict, keep_ids: set[str] = frozenset()) -> None:
+    """
+    Removes the points previously indexed for a file, except `keep_ids`.
+    Entries from the legacy manifest have no recorded IDs, so their points
+    are matched on the `metadata.source` payload instead.
+    """
+    point_ids = entry.get("point_ids")
+    if point_ids is None:
+        selector = models.FilterSelector(filter=models.Filter(must=[
+            models.FieldCondition(key="metadata.source", match=models.MatchAny(any=[path, Path(path).name]))
+        ]))
+    else:
+        stale_ids = [pid for pid in point_ids if pid not in keep_ids]
+        if not stale_ids:
+            return
+        selector = models.PointIdsList(points=stale_ids)
+    client.delete(collection_name=settings.QDRANT_COLLECTION_NAME, points_selector=selector)
+
+
+def upsert_chunks(
+    client: QdrantClient,
+    chunks: list[Document],
+    chunk_ids: list[str],
+    vectors: list[list[float]],
+    batch_size: int = 256,
+) -> None:
+    """
+    Writes embedded chunks to Qdrant using the same payload layout as
+    langchain_qdrant ("page_content" + "metadata"), so the app's retriever
+    and grounding lookups read them unchanged.
+    """
+    for start in range(0, len(chunks), batch_size):
+        points = [
+            models.PointStruct(
+                id=pid,
+                vector=vector,
+                payload={"page_content": doc.page_content, "metadata": doc.metadata},
+            )
+            for doc, pid, vector in zip(
+                chunks[start:start + batch_size],
+                chunk_ids[start:start + batch_size],
+                vectors[start:start + batch_size],
+            )
+        ]
+        client.upsert(collection_name=settings.QDRANT_COLLECTION_NAME, points=points)
+
+
+def export_chunk_store(client: QdrantClient, chunk_store_path: Path) -> None:
+    """
+    Rewrites the compact id -> (title, text) chunk store that the app uses to
+    answer grounding lookups without querying Qdrant, and the BM25 lexical
+    index built from the same chunks. Both are rebuilt from the whole
+    collection so they always match what is indexed.
+    """
+    logger.info(f"Writing grounding chunk store to '{chunk_store_path}'...")
+    try:
+        count = dump_collection(client, settings.QDRANT_COLLECTION_NAME, chunk_store_path)
+        logger.info(f"Chunk store written with {count} chunks.")
+    except Exception as e:
+        logger.error(f"Failed to write chunk store: {e}", exc_info=True)
+        return
 
-    logger.info(f"Total of {len(final_chunks)} chunks prepared for ingestion.")
-    return final_chunks
+    lexical_index_path = chunk_store_path.parent / settings.LEXICAL_INDEX_FILENAME
+    store = ChunkStore(chunk_store_path)
+    try:
+        index = BM25Index.build((chunk_id, text) for chunk_id, _, text in store.items())
+        index.save(lexical_index_path)
+        logger.info(f"Lexical (BM25) index written with {len(index)} chunks to '{lexical_index_path}'.")
+    except Exception as e:
+        logger.error(f"Failed to write lexical index: {e}", exc_info=True)
+    finally:
+        store.close()
 
 
 # ==============================================================================
-# 3. MAIN WORKFLOW: build_vector_store
+# 4. STREAMING PIPELINE: load -> split -> embed -> upsert
+# ==============================================================================
+# Each stage is a generator; `prefetch` runs a stage in its own thread behind a
+# bounded queue, so parsing, embedding and upserting overlap while only a few
+# batches are ever held in memory. Files are committed to the manifest as soon
+# as all of their chunks are upserted, so a crash loses at most the files in
+# flight, and deterministic point IDs make the retry idempotent.
+
+_END = object()
+
+
+class FileDone:
+    """Stream marker emitted after the last chunk of a file."""
+
+    def __init__(self, path: str, point_ids: list[str], failed: bool):
+        self.path = path
+        self.point_ids = point_ids
+        self.failed = failed
+
+
+def prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Iterates `iterable` in a background thread, handing items over through a
+    queue of at most `maxsize` entries. Exceptions are re-raised in the
+    consumer, and the producer stops if the consumer goes away.
+    """
+    items: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+            _put(_END)
+        except BaseException as e:
+            _put(e)
+
+    thread = threading.Thread(target=_produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def iter_file_chunks(
+    file_paths: list[str],
+    text_splitter: RecursiveCharacterTextSplitter,
+    tabular_pdf_names: list[str],
+    data_root: Path,
+    previous_ids: dict[str, set[str]],
+    workers: int = 1,
+) -> Iterator:
+    """
+    Streams (point_id, chunk) pairs for new or modified chunks, splitting each
+    page as it is loaded, followed by a FileDone marker per file. Chunks whose
+    deterministic ID is already indexed for that file are not re-emitted.
+    """
+    for file_path_str, docs in iter_loaded_files(file_paths, tabular_pdf_names, workers=workers):
+        file_key = Path(file_path_str).relative_to(data_root).as_posix()
+        already_indexed = previous_ids.get(file_path_str, set())
+        is_tabular = Path(file_path_str).name in tabular_pdf_names
+        point_ids: list[str] = []
+        failed = docs is None
+        if not failed:
+            try:
+                for doc in docs:
+                    # Table documents are already one clean document per product.
+                    pieces = [doc] if is_tabular else text_splitter.split_documents([doc])
+                    for chunk in pieces:
+                        pid = chunk_point_id(file_key, len(point_ids), chunk)
+                        point_ids.append(pid)
+                        if pid not in already_indexed:
+                            yield pid, chunk
+            except FileLoadError:
+                failed = True
+        yield FileDone(file_path_str, point_ids, failed)
+
+
+def iter_embedded_batches(items: Iterable, scheduler: EmbeddingScheduler, batch_size: int) -> Iterator:
+    """
+    Groups streamed chunks into batches of `batch_size`, embeds each batch and
+    yields (chunks, point_ids, vectors, finished files). A FileDone is released
+    with the batch holding that file's last chunk, never earlier.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        chunks, chunk_ids, finished = [], [], []
+        for item in items:
+            if isinstance(item, FileDone):
+                finished.append(item)
+                continue
+            pid, chunk = item
+            chunk_ids.append(pid)
+            chunks.append(chunk)
+            if len(chunks) >= batch_size:
+                vectors = loop.run_until_complete(scheduler.embed([c.page_content for c in chunks]))
+                yield chunks, chunk_ids, vectors, finished
+                chunks, chunk_ids, finished = [], [], []
+        if chunks or finished:
+            vectors = loop.run_until_complete(scheduler.embed([c.page_content for c in chunks]))
+            yield chunks, chunk_ids, vectors, finished
+    finally:
+        loop.close()
+
+
+# ==============================================================================
+# 5. MAIN WORKFLOW: build_vector_store
 # ==============================================================================
 
 def build_vector_store():
@@ -155,80 +477,145 @@ def build_vector_store():
     tabular_pdf_names = [name.strip() for name in settings.TABULAR_PDF_FILES.split(',') if name.strip()]
     embedding_dimensions = settings.EMBEDDING_DIMENSIONS
 
-    # --- Identify New Documents ---
+    # --- Identify New, Changed and Removed Documents ---
     qdrant_path_obj = Path(settings.QDRANT_PATH)
     qdrant_path_obj.mkdir(parents=True, exist_ok=True)
     manifest_path = qdrant_path_obj / "processed_files.json"
     
-    processed_files = set()
-    if manifest_path.exists():
-        with open(manifest_path, "r") as f:
-            processed_files = set(json.load(f))
-    logger.info(f"Found manifest for {len(processed_files)} previously processed files.")
+    manifest = load_manifest(manifest_path)
+    logger.info(f"Found manifest for {len(manifest)} previously processed files.")
+
+    all_source_files = sorted(str(p) for p in Path(settings.DATA_PATH).rglob("*") if p.is_file())
+    changed_files, removed_files, unchanged_files = detect_changes(manifest, all_source_files)
+    files_to_process = list(changed_files)
+    logger.info(f"{len(files_to_process)} new or changed file(s), {len(removed_files)} removed, {len(unchanged_files)} unchanged.")
 
-    all_source_files = {str(p) for p in Path(settings.DATA_PATH).rglob("*") if p.is_file()}
-    files_to_process = sorted(list(all_source_files - processed_files))
+    chunk_store_path = qdrant_path_obj / settings.CHUNK_STORE_FILENAME
 
-    if not files_to_process:
+    if not files_to_process and not removed_files:
         logger.info("Knowledge base is already up to date. No new documents to process.")
+        if not chunk_store_path.exists():
+            export_chunk_store(open_qdrant_client(settings), chunk_store_path)
+        if unchanged_files != manifest:
+            save_manifest(manifest_path, unchanged_files)
         logger.info("--- Ingestion Complete ---")
         return
 
-    # --- Load & Chunk New Documents ---
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP
-    )
-    chunks = load_and_chunk_documents(files_to_process, text_splitter, tabular_pdf_names)
-    
-    if not chunks:
-        logger.error("Failed to create any chunks from the new documents. Exiting.")
-        return
-
     # --- Initialize Clients and Embed ---
     logger.info(f"Initializing Azure embeddings model: '{settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT}'")
-    embeddings = AzureOpenAIEmbeddings(
-        azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_version=settings.AZURE_OPENAI_EMBEDDING_API_VERSION,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        chunk_size= settings.AZURE_OPENAI_EMBEDDING_BATCH_SIZE
+    scheduler = EmbeddingScheduler(
+        # Retries are handled by the scheduler so Retry-After can be honored per batch.
+        AsyncAzureOpenAI(
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_EMBEDDING_API_VERSION,
+            max_retries=0,
+        ),
+        deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+        max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+        max_retries=settings.EMBEDDING_MAX_RETRIES,
+        # Unchanged chunk texts are served from disk on rebuilds instead of re-embedded.
+        cache=DiskEmbeddingCache(
+            Path(settings.EMBEDDING_CACHE_PATH),
+            settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            embedding_dimensions,
+        ) if settings.EMBEDDING_CACHE_PATH else None,
     )
 
-    logger.info(f"Initializing Qdrant client at '{settings.QDRANT_PATH}'...")
-    client = QdrantClient(path=settings.QDRANT_PATH)
+    logger.info(f"Initializing Qdrant client at '{settings.QDRANT_URL or settings.QDRANT_PATH}'...")
+    client = open_qdrant_client(settings)
 
-    try:
-        client.get_collection(collection_name=settings.QDRANT_COLLECTION_NAME)
+    if client.collection_exists(collection_name=settings.QDRANT_COLLECTION_NAME):
         logger.info(f"Using existing Qdrant collection: '{settings.QDRANT_COLLECTION_NAME}'")
-    except Exception:
-        logger.info(f"Creating new Qdrant collection: '{settings.QDRANT_COLLECTION_NAME}'")
-        client.recreate_collection(
+        try:
+            apply_collection_tuning(client, settings.QDRANT_COLLECTION_NAME, settings)
+        except Exception as e:
+            logger.warning(f"Could not apply quantization/HNSW/on-disk settings to the existing collection: {e}")
+    else:
+        logger.info(f"Creating new Qdrant collection: '{settings.QDRANT_COLLECTION_NAME}' (quantization: {settings.QDRANT_QUANTIZATION})")
+        client.create_collection(
             collection_name=settings.QDRANT_COLLECTION_NAME,
-            vectors_config=models.VectorParams(size=embedding_dimensions, distance=models.Distance.COSINE),
+            **build_collection_kwargs(settings, embedding_dimensions),
         )
 
-    qdrant_store = QdrantVectorStore(
-        client=client,
-        collection_name=settings.QDRANT_COLLECTION_NAME,
-        embedding=embeddings
+    # Legacy entries are matched by payload, which would also match the new
+    # points, so they must be cleared before indexing.
+    for file_path_str in files_to_process:
+        entry = manifest.get(file_path_str)
+        if entry and entry.get("point_ids") is None:
+            delete_file_points(client, file_path_str, entry)
+
+    # --- Stream New or Changed Documents into Qdrant ---
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP
+    )
+    workers = settings.INGEST_WORKERS or os.cpu_count() or 1
+    batch_size = settings.INGEST_BATCH_SIZE
+    previous_ids = {path: set(entry.get("point_ids") or []) for path, entry in manifest.items()}
+
+    chunk_stream = prefetch(
+        iter_file_chunks(files_to_process, text_splitter, tabular_pdf_names, Path(settings.DATA_PATH), previous_ids, workers=workers),
+        maxsize=batch_size * settings.INGEST_QUEUE_BATCHES,
+    )
+    batch_stream = prefetch(
+        iter_embedded_batches(chunk_stream, scheduler, batch_size),
+        maxsize=settings.INGEST_QUEUE_BATCHES,
     )
 
-    # --- Index Data into Qdrant ---
-    logger.info(f"Adding {len(chunks)} new chunks to the '{settings.QDRANT_COLLECTION_NAME}' collection...")
-    qdrant_store.add_documents(chunks)
-    logger.info("Successfully added new documents to the vector store.")
+    # Unchanged files keep their refreshed entries; changed files keep their old
+    # entry (and thus their old point IDs) until their replacement is committed.
+    working_manifest = {**manifest, **unchanged_files}
+    indexed_chunks = committed_files = 0
+    for chunks, chunk_ids, vectors, finished in batch_stream:
+        if chunks:
+            upsert_chunks(client, chunks, chunk_ids, vectors)
+            indexed_chunks += len(chunks)
+            logger.info(f"Upserted {indexed_chunks} chunks into '{settings.QDRANT_COLLECTION_NAME}' so far.")
+
+        for done in finished:
+            if done.failed:
+                logger.warning(f"'{Path(done.path).name}' failed to load; it will be retried on the next run.")
+                # Chunks read before the failure are already upserted but not in the
+                # manifest; drop them. Points of the previous version stay listed there.
+                delete_file_points(client, done.path, {"point_ids": done.point_ids}, keep_ids=previous_ids.get(done.path, set()))
+                continue
+            previous_entry = manifest.get(done.path) or {}
+            if previous_entry.get("point_ids") is not None:
+                delete_file_points(client, done.path, previous_entry, keep_ids=set(done.point_ids))
+            stat = Path(done.path).stat()
+            working_manifest[done.path] = {
+                "sha256": changed_files[done.path],
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "point_ids": done.point_ids,
+            }
+            committed_files += 1
+        if finished:
+            save_manifest(manifest_path, working_manifest)
+    logger.info(f"Indexed {indexed_chunks} new or modified chunks from {committed_files} file(s).")
+
+    # --- Remove Points of Deleted Files ---
+    for file_path_str in removed_files:
+        logger.info(f"Removing points for deleted file '{file_path_str}'")
+        delete_file_points(client, file_path_str, manifest[file_path_str])
+        working_manifest.pop(file_path_str, None)
+
+    # --- Refresh the Grounding Chunk Store ---
+    export_chunk_store(client, chunk_store_path)
 
     # --- Update Manifest ---
-    with open(manifest_path, "w") as f:
-        json.dump(sorted(list(all_source_files)), f)
-    logger.info(f"Manifest file updated. Total files processed: {len(all_source_files)}.")
+    save_manifest(manifest_path, working_manifest)
+    logger.info(f"Manifest file updated. Total files processed: {len(working_manifest)}.")
+    # Running servers drop search evidence cached from the previous contents.
+    mark_collection_updated(qdrant_path_obj)
     
     logger.info("--- Knowledge Base Ingestion Complete ---")
 
 
 # ==============================================================================
-# 4. SCRIPT ENTRY POINT
+# 6. SCRIPT ENTRY POINT
 # ==============================================================================
 
 if __name__ == "__main__":
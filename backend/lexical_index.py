@@ -0,0 +1,123 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("voicerag.lexical_index")
+
+# Words plus SKU/plan-style tokens such as "e3", "m365", "p1-v2" or "10.5".
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits text into search terms. Compound tokens ("p1-v2")
+    are kept whole and also contribute their parts, so both an exact SKU and
+    its pieces can match.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+class BM25Index:
+    """
+    Small in-memory Okapi BM25 index over the knowledge-base chunks.
+
+    Built by `ingest.py` alongside the chunk store and saved as JSON; the app
+    loads it at startup. Searching never touches the network, which is what
+    lets retrieval degrade to lexical-only when the embedding service is slow.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunk_ids: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avg_doc_length = 0.0
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Indexes (chunk_id, text) records."""
+        index = cls(k1=k1, b=b)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_idx, (chunk_id, text) in enumerate(records):
+            terms = Counter(tokenize(text))
+            index.chunk_ids.append(chunk_id)
+            index.doc_lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings[term].append((doc_idx, tf))
+        index.postings = dict(postings)
+        index.avg_doc_length = (sum(index.doc_lengths) / len(index.doc_lengths)) if index.doc_lengths else 0.0
+        return index
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Returns up to `k` (chunk_id, bm25 score) pairs, best first."""
+        n_docs = len(self.chunk_ids)
+        if n_docs == 0:
+            return []
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / (self.avg_doc_length or 1))
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.chunk_ids[doc_idx], score) for doc_idx, score in best]
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "chunk_ids": self.chunk_ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        """Loads a saved index, or returns None if it is missing or unreadable."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load lexical index '{path}': {e}")
+            return None
+        index = cls(k1=data["k1"], b=data["b"])
+        index.chunk_ids = data["chunk_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = {term: [tuple(p) for p in postings] for term, postings in data["postings"].items()}
+        index.avg_doc_length = (sum(index.doc_lengths) / len(index.doc_lengths)) if index.doc_lengths else 0.0
+        logger.info(f"Loaded lexical index with {len(index)} chunks from '{path}'.")
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuses ranked ID lists: each ID scores sum(1 / (k + rank)) over the lists it appears in."""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,334 @@
+"""
+Offline load test for the /realtime relay.
+
+Starts a local fake Azure OpenAI service (fake_realtime.py), runs the real
+app (app.create_app) against it in a child process, opens N concurrent
+simulated calls and reports throughput, relay latency, tool latency and the
+app's CPU time per session. Nothing leaves the machine.
+
+    python loadtest.py --sessions 50 --turns 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+from fake_realtime import SILENCE_100MS, FakeRealtimeServer, RealtimeScript, event_sent_ns
+from local_embeddings import HashEmbeddings
+from rtmt import BINARY_AUDIO_PROTOCOL, decode_audio_frame
+
+logger = logging.getLogger("voicerag.loadtest")
+
+_PRODUCTS = ["Microsoft 365 E3", "Microsoft 365 E5", "Business Basic", "Business Standard", "Business Premium", "Teams Phone", "Copilot", "Exchange Online Plan 1"]
+_FACTS = ["costs {price} per user per month", "includes {n} GB of mailbox storage", "supports up to {n} users", "requires an annual commitment", "adds advanced threat protection", "includes desktop Office apps"]
+QUERIES = [
+    "How much does Microsoft 365 E3 cost per user?",
+    "What storage comes with Business Basic?",
+    "Does Business Premium include threat protection?",
+    "How many users can Business Standard support?",
+    "Is an annual commitment required for Teams Phone?",
+    "What does Copilot cost per month?",
+]
+
+
+# ==============================================================================
+# 1. Synthetic Knowledge Base
+# ==============================================================================
+
+def build_synthetic_knowledge_base(path: Path, collection_name: str, dimensions: int, chunks: int, seed: int = 7) -> None:
+    """
+    Writes a small Qdrant collection plus the chunk store and BM25 index the
+    app expects, embedded with HashEmbeddings so the fake embeddings
+    endpoint produces matching query vectors.
+    """
+    from qdrant_client import QdrantClient, models
+
+    from chunk_store import write_chunk_store
+    from config import settings
+    from lexical_index import BM25Index
+
+    rng = random.Random(seed)
+    embeddings = HashEmbeddings(dimensions)
+    records = []
+    for i in range(chunks):
+        product = rng.choice(_PRODUCTS)
+        facts = [rng.choice(_FACTS).format(price=f"${rng.randint(4, 60)}.00", n=rng.choice([50, 100, 300, 1024])) for _ in range(3)]
+        text = f"{product} " + ". ".join(facts) + "."
+        records.append((str(uuid.uuid5(uuid.NAMESPACE_URL, f"loadtest/{i}")), f"synthetic-{i % 10}.pdf", text))
+
+    client = QdrantClient(path=str(path))
+    client.create_collection(collection_name, vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE))
+    client.upsert(
+        collection_name,
+        points=[
+            models.PointStruct(id=chunk_id, vector=embeddings.embed(text), payload={"page_content": text, "metadata": {"source": title}})
+            for chunk_id, title, text in records
+        ],
+    )
+    client.close()
+    write_chunk_store(path / settings.CHUNK_STORE_FILENAME, records)
+    BM25Index.build((chunk_id, text) for chunk_id, _, text in records).save(path / settings.LEXICAL_INDEX_FILENAME)
+
+
+# ==============================================================================
+# 2. App Under Test (child process)
+# ==============================================================================
+
+def _serve_app(port: int, env: Dict[str, str], verbose: bool) -> None:
+    """Child-process entry point: runs app.create_app() exactly as in production."""
+    os.environ.update(env)
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+    from aiohttp import web
+
+    import app as voicerag_app
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    web.run_app(voicerag_app.create_app(), host="127.0.0.1", port=port, print=None)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_until_serving(url: str, child: multiprocessing.Process, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while True:
+            if not child.is_alive():
+                raise RuntimeError(f"App process exited during startup (code {child.exitcode}); rerun with --verbose for its logs.")
+            try:
+                async with http.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"App was not ready at {url} within {timeout}s.")
+            await asyncio.sleep(0.25)
+
+
+async def _app_cpu_seconds(http: aiohttp.ClientSession, metrics_url: str) -> Optional[float]:
+    """Reads the app process's CPU time from its /metrics endpoint."""
+    async with http.get(metrics_url) as response:
+        for line in (await response.text()).splitlines():
+            if line.startswith("process_cpu_seconds_total "):
+                return float(line.split()[1])
+    return None
+
+
+# ==============================================================================
+# 3. Simulated Callers
+# ==============================================================================
+
+class CallStats:
+    def __init__(self):
+        self.turns = 0
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.relay_latencies: List[float] = []
+        self.turn_latencies: List[float] = []
+        self.rejected = False
+        self.error: Optional[str] = None
+
+
+async def simulate_call(http: aiohttp.ClientSession, url: str, turns: int, audio_frames: int, realtime: bool, binary_audio: bool = False) -> CallStats:
+    """
+    One caller: configures the session, then per turn streams `audio_frames`
+    100 ms audio chunks, commits, and waits for the spoken answer. Every
+    server event is timestamped by the fake service, so the time to reach the
+    caller is the relay's added latency plus one loopback hop (binary audio
+    frames carry no timestamp and are left out of that figure).
+    """
+    stats = CallStats()
+    protocols = (BINARY_AUDIO_PROTOCOL,) if binary_audio else ()
+    try:
+        async with http.ws_connect(url, max_msg_size=0, protocols=protocols) as ws:
+            async def send(event: dict) -> None:
+                await ws.send_str(json.dumps(event))
+                stats.messages_sent += 1
+
+            async def receive_until(done_type: str, after_audio: bool = False) -> None:
+                heard_audio = False
+                async for msg in ws:
+                    received_ns = time.perf_counter_ns()
+                    if msg.type == aiohttp.WSMsgType.BINARY and binary_audio:
+                        decode_audio_frame(msg.data)
+                        event_type = "response.audio.delta"
+                    elif msg.type == aiohttp.WSMsgType.TEXT:
+                        event = json.loads(msg.data)
+                        event_type = event["type"]
+                        sent_ns = event_sent_ns(event)
+                        if sent_ns is not None:
+                            stats.relay_latencies.append((received_ns - sent_ns) / 1e9)
+                    else:
+                        raise ConnectionError(f"unexpected {msg.type}")
+                    stats.messages_received += 1
+                    stats.bytes_received += len(msg.data)
+                    if event_type == "response.audio.delta" and not heard_audio:
+                        heard_audio = True
+                        stats.turn_latencies.append(time.perf_counter() - committed_at)
+                    if event_type == done_type and (heard_audio or not after_audio):
+                        return
+                raise ConnectionError("relay closed the connection")
+
+            committed_at = time.perf_counter()
+            await send({"type": "session.update", "session": {"modalities": ["text", "audio"]}})
+            await receive_until("session.updated")
+            for _ in range(turns):
+                for _ in range(audio_frames):
+                    await send({"type": "input_audio_buffer.append", "audio": SILENCE_100MS})
+                    await asyncio.sleep(0.1 if realtime else 0)
+                committed_at = time.perf_counter()
+                await send({"type": "input_audio_buffer.commit"})
+                await receive_until("response.done", after_audio=True)
+                stats.turns += 1
+    except aiohttp.WSServerHandshakeError as e:
+        if e.status == 503:
+            stats.rejected = True
+        else:
+            stats.error = str(e)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+    return stats
+
+
+# ==============================================================================
+# 4. Report
+# ==============================================================================
+
+def _ms(values: List[float], q: float) -> str:
+    return f"{np.percentile(values, q) * 1000:8.1f} ms" if values else "     n/a"
+
+
+def print_report(calls: List[CallStats], fake: FakeRealtimeServer, wall: float, cpu: Optional[float]) -> None:
+    served = [c for c in calls if not c.rejected and c.error is None]
+    turns = sum(c.turns for c in calls)
+    messages = sum(c.messages_sent + c.messages_received for c in calls)
+    relay = [v for c in calls for v in c.relay_latencies]
+    turn_latency = [v for c in calls for v in c.turn_latencies]
+
+    print()
+    print("=" * 60)
+    print(f" Sessions: {len(served)} completed, {sum(c.rejected for c in calls)} rejected, {sum(c.error is not None for c in calls)} failed")
+    print(f" Wall time: {wall:.2f}s")
+    print(f" Throughput: {turns / wall:.1f} turns/s, {messages / wall:.0f} relayed msgs/s")
+    print(f" Received by callers: {sum(c.bytes_received for c in calls) / 1e6:.2f} MB")
+    print(f" Audio appends reaching the service: {fake.audio_appends} ({fake.audio_appends / wall:.0f} msgs/s)")
+    print(f" Relay latency (service -> caller)  p50 {_ms(relay, 50)}   p99 {_ms(relay, 99)}")
+    print(f" Tool round trip (service side)     p50 {_ms(fake.tool_latencies, 50)}   p99 {_ms(fake.tool_latencies, 99)}")
+    print(f" Commit -> first audio delta        p50 {_ms(turn_latency, 50)}   p99 {_ms(turn_latency, 99)}")
+    if cpu is not None and calls:
+        print(f" App CPU: {cpu:.2f}s total, {cpu / len(calls) * 1000:.1f} ms per session")
+    else:
+        print(" App CPU: n/a")
+    for c in calls:
+        if c.error is not None:
+            print(f"  ! {c.error}")
+            break
+    print("=" * 60)
+
+
+# ==============================================================================
+# 5. Entry Point
+# ==============================================================================
+
+async def run(args: argparse.Namespace) -> None:
+    script = RealtimeScript(QUERIES, tool_every=args.tool_every, response_deltas=args.response_deltas, delta_interval=args.delta_interval)
+    fake = FakeRealtimeServer(script, embedding_dimensions=args.embedding_dim)
+    endpoint = await fake.start()
+
+    with tempfile.TemporaryDirectory(prefix="voicerag-loadtest-") as tmp:
+        env = {
+            "AZURE_OPENAI_ENDPOINT": endpoint,
+            "AZURE_OPENAI_API_KEY": "loadtest",
+            "AZURE_OPENAI_API_VERSION": "2024-10-01-preview",
+            "AZURE_OPENAI_REALTIME_DEPLOYMENT": "fake-realtime",
+            "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "fake-embedding",
+            "AZURE_OPENAI_EMBEDDING_API_VERSION": "2024-02-01",
+            "AZURE_OPENAI_REALTIME_USE_API_KEY": "true",
+            "EMBEDDING_DIMENSIONS": str(args.embedding_dim),
+            "DATA_PATH": os.environ.get("DATA_PATH", tmp),
+            "QDRANT_PATH": args.qdrant_path or tmp,
+            "QUERY_EMBEDDING_CACHE_PATH": "",
+            "SERVE_FRONTEND": "false",
+        }
+        if args.qdrant_path is None or args.collection:
+            env["QDRANT_COLLECTION_NAME"] = args.collection or "loadtest"
+        for assignment in args.set or []:
+            key, _, value = assignment.partition("=")
+            env[key] = value
+        # The synthetic knowledge base is written with the same settings the app will read.
+        os.environ.update(env)
+        if args.qdrant_path is None:
+            build_synthetic_knowledge_base(Path(tmp), env["QDRANT_COLLECTION_NAME"], args.embedding_dim, args.chunks)
+
+        port = _free_port()
+        metrics_url = f"http://127.0.0.1:{port}/metrics"
+        child = multiprocessing.get_context("spawn").Process(target=_serve_app, args=(port, env, args.verbose), daemon=True)
+        child.start()
+        try:
+            # The app listens while it warms up; /readyz turns 200 once it takes calls.
+            await _wait_until_serving(f"http://127.0.0.1:{port}/readyz", child)
+            url = f"http://127.0.0.1:{port}/realtime"
+            print(f"Running {args.sessions} concurrent sessions x {args.turns} turns against {url} ...")
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as http:
+                cpu_before = await _app_cpu_seconds(http, metrics_url)
+                started = time.perf_counter()
+
+                async def _delayed(i: int) -> CallStats:
+                    await asyncio.sleep(args.ramp * i / max(1, args.sessions))
+                    return await simulate_call(http, url, args.turns, args.audio_frames, args.realtime, args.binary_audio)
+                calls = await asyncio.gather(*(_delayed(i) for i in range(args.sessions)))
+                wall = time.perf_counter() - started
+                cpu_after = await _app_cpu_seconds(http, metrics_url)
+        finally:
+            child.terminate()
+            child.join(timeout=30)
+            await fake.stop()
+
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    print_report(list(calls), fake, wall, cpu)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for the /realtime relay.")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent simulated calls.")
+    parser.add_argument("--turns", type=int, default=3, help="User turns per call.")
+    parser.add_argument("--audio-frames", type=int, default=10, help="100 ms audio chunks sent per turn.")
+    parser.add_argument("--realtime", action="store_true", help="Pace caller audio in real time instead of as fast as possible.")
+    parser.add_argument("--binary-audio", action="store_true", help="Negotiate binary response audio frames instead of base64 JSON deltas.")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which calls are started.")
+    parser.add_argument("--tool-every", type=int, default=2, help="Every n-th turn triggers a SearchInput call (0 disables).")
+    parser.add_argument("--response-deltas", type=int, default=20, help="Audio deltas per spoken answer.")
+    parser.add_argument("--delta-interval", type=float, default=0.005, help="Seconds between answer audio deltas.")
+    parser.add_argument("--embedding-dim", type=int, default=256, help="Dimensions of the fake embeddings.")
+    parser.add_argument("--chunks", type=int, default=500, help="Chunks in the synthetic knowledge base.")
+    parser.add_argument("--qdrant-path", help="Use an existing Qdrant directory (its vectors must be --embedding-dim wide).")
+    parser.add_argument("--collection", help="Collection name (defaults to QDRANT_COLLECTION_NAME with --qdrant-path).")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="Extra app setting, e.g. --set MAX_CONCURRENT_SESSIONS=50.")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own logs.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import hashlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand-in for the Azure embedding deployment.
+
+    Each token (see `lexical_index.tokenize`) is hashed to a signed
+    coordinate and the resulting bag-of-words vector is L2-normalized, so
+    texts sharing vocabulary have a high cosine similarity. It needs no
+    network or model download and always returns the same vector for the same
+    text, which is what the load test and retrieval benchmark need; it is not
+    a substitute for a real embedding model's quality.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            # Texts without tokens still need a valid (non-zero) cosine vector.
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed(text)
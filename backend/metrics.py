@@ -0,0 +1,289 @@
+import bisect
+import logging
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger("voicerag.metrics")
+
+# Latency buckets in seconds, from sub-millisecond relay work up to slow tool calls.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ==============================================================================
+# Metric Types
+# ==============================================================================
+# A minimal in-process implementation of the Prometheus text format. Everything
+# is recorded from the aiohttp event loop, so updates are plain dict and float
+# operations with no locking; the cost of a sample is a dict lookup plus, for
+# histograms, a bisect over a dozen buckets.
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(label) for label in labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> Iterable[str]:
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(self._sums[key])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+REGISTRY: List[_Metric] = []
+
+
+# ==============================================================================
+# Application Metrics
+# ==============================================================================
+
+ACTIVE_SESSIONS = Gauge("voicerag_active_sessions", "Realtime sessions currently being relayed.")
+SESSIONS_TOTAL = Counter("voicerag_sessions_total", "Realtime sessions started.")
+SESSIONS_QUEUED = Gauge("voicerag_sessions_queued", "Calls waiting for a free session slot.")
+SESSIONS_REJECTED_TOTAL = Counter("voicerag_sessions_rejected_total", "Calls rejected by admission control.")
+UPSTREAM_CONNECT_SECONDS = Histogram(
+    "voicerag_upstream_connect_seconds",
+    "Time to obtain a realtime socket to Azure OpenAI (pooled sockets are near zero).",
+    ["pooled"],
+)
+FIRST_AUDIO_SECONDS = Histogram(
+    "voicerag_first_audio_seconds",
+    "Time from the end of the user's speech to the first response audio delta.",
+)
+TOOL_SECONDS = Histogram("voicerag_tool_seconds", "Tool execution time.", ["tool"])
+RETRIEVAL_STAGE_SECONDS = Histogram(
+    "voicerag_retrieval_stage_seconds",
+    "Time spent in each retrieval stage of the search tool.",
+    ["stage"],
+)
+EVIDENCE_CACHE_LOOKUPS_TOTAL = Counter(
+    "voicerag_evidence_cache_lookups_total",
+    "Semantic evidence cache lookups by the search tool.",
+    ["result"],
+)
+AUDIO_APPENDS_TOTAL = Counter(
+    "voicerag_audio_appends_total",
+    "Input audio append events received from callers and sent upstream (fewer when coalescing).",
+    ["stage"],
+)
+RELAY_MESSAGES_TOTAL = Counter("voicerag_relay_messages_total", "WebSocket messages relayed.", ["direction"])
+RELAY_BYTES_TOTAL = Counter("voicerag_relay_bytes_total", "WebSocket payload bytes relayed.", ["direction"])
+
+CLIENT_TO_SERVER = "client_to_server"
+SERVER_TO_CLIENT = "server_to_client"
+
+
+class SessionMetrics:
+    """
+    Per-connection counters for one realtime session.
+
+    The relay loops bump plain attributes on every frame; the totals are
+    folded into the process-wide counters when the session ends (and added
+    on the fly for live sessions when /metrics is scraped).
+    """
+
+    _live: "set[SessionMetrics]" = set()
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.connect_seconds: Optional[float] = None
+        self.messages_in = 0
+        self.bytes_in = 0
+        self.messages_out = 0
+        self.bytes_out = 0
+        self.appends_received = 0
+        self.appends_sent = 0
+        self.first_audio_latencies: List[float] = []
+        self._speech_stopped_at: Optional[float] = None
+        self._closed = False
+        SessionMetrics._live.add(self)
+        ACTIVE_SESSIONS.inc()
+        SESSIONS_TOTAL.inc()
+
+    def upstream_connected(self, seconds: float, pooled: bool) -> None:
+        self.connect_seconds = seconds
+        UPSTREAM_CONNECT_SECONDS.observe(seconds, "true" if pooled else "false")
+
+    def speech_stopped(self) -> None:
+        self._speech_stopped_at = time.monotonic()
+
+    def audio_delta(self) -> None:
+        if self._speech_stopped_at is not None:
+            latency = time.monotonic() - self._speech_stopped_at
+            self._speech_stopped_at = None
+            self.first_audio_latencies.append(latency)
+            FIRST_AUDIO_SECONDS.observe(latency)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        SessionMetrics._live.discard(self)
+        ACTIVE_SESSIONS.dec()
+        RELAY_MESSAGES_TOTAL.inc(self.messages_in, CLIENT_TO_SERVER)
+        RELAY_BYTES_TOTAL.inc(self.bytes_in, CLIENT_TO_SERVER)
+        RELAY_MESSAGES_TOTAL.inc(self.messages_out, SERVER_TO_CLIENT)
+        RELAY_BYTES_TOTAL.inc(self.bytes_out, SERVER_TO_CLIENT)
+        AUDIO_APPENDS_TOTAL.inc(self.appends_received, "received")
+        AUDIO_APPENDS_TOTAL.inc(self.appends_sent, "sent")
+
+        duration = time.monotonic() - self.started_at
+        latencies = sorted(self.first_audio_latencies)
+        median = f"{latencies[len(latencies) // 2] * 1000:.0f}ms" if latencies else "n/a"
+        connect = f"{self.connect_seconds * 1000:.0f}ms" if self.connect_seconds is not None else "n/a"
+        logger.info(
+            f"Session ended after {duration:.1f}s: upstream connect {connect}, "
+            f"{len(latencies)} turn(s) with median first-audio {median}, "
+            f"client->server {self.messages_in} msgs/{self.bytes_in} B "
+            f"({self.messages_in / max(duration, 1e-9):.1f} msgs/s, audio appends {self.appends_received} -> {self.appends_sent}), "
+            f"server->client {self.messages_out} msgs/{self.bytes_out} B."
+        )
+
+    @classmethod
+    def live_totals(cls) -> Dict[str, Tuple[int, int]]:
+        totals = {CLIENT_TO_SERVER: [0, 0], SERVER_TO_CLIENT: [0, 0]}
+        for session in cls._live:
+            totals[CLIENT_TO_SERVER][0] += session.messages_in
+            totals[CLIENT_TO_SERVER][1] += session.bytes_in
+            totals[SERVER_TO_CLIENT][0] += session.messages_out
+            totals[SERVER_TO_CLIENT][1] += session.bytes_out
+        return {direction: tuple(values) for direction, values in totals.items()}
+
+
+class timed:
+    """Context manager observing the elapsed time of its block in a histogram."""
+
+    __slots__ = ("histogram", "labels", "_start")
+
+    def __init__(self, histogram: Histogram, *labels: str):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "timed":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self._start, *self.labels)
+
+
+# ==============================================================================
+# Exposition
+# ==============================================================================
+
+def render() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    live = SessionMetrics.live_totals()
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        if metric is RELAY_MESSAGES_TOTAL or metric is RELAY_BYTES_TOTAL:
+            # Include frames relayed by sessions that are still open.
+            position = 0 if metric is RELAY_MESSAGES_TOTAL else 1
+            for direction in (CLIENT_TO_SERVER, SERVER_TO_CLIENT):
+                value = metric.get(direction) + live[direction][position]
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, (direction,))} {_format_value(value)}")
+            continue
+        lines.extend(metric.samples())
+    lines.extend([
+        "# HELP process_cpu_seconds_total Total user and system CPU time spent in seconds.",
+        "# TYPE process_cpu_seconds_total counter",
+        f"process_cpu_seconds_total {_format_value(time.process_time())}",
+    ])
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", headers={"Cache-Control": "no-store"})
+
+
+def attach_to_app(app: web.Application, path: str = "/metrics") -> None:
+    app.router.add_get(path, metrics_handler)
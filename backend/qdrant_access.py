@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+from qdrant_client import QdrantClient, models
+
+logger = logging.getLogger("voicerag.qdrant_access")
+
+
+# ==============================================================================
+# Collection & Search Tuning
+# ==============================================================================
+# Built from config.Settings so ingest.py (collection creation) and app.py
+# (search) agree. Note that the embedded local mode (`QdrantClient(path=...)`)
+# does brute-force search and ignores HNSW and quantization; they take effect
+# against a Qdrant server.
+
+def open_qdrant_client(cfg) -> QdrantClient:
+    """A client for the configured Qdrant server, or the embedded store at QDRANT_PATH."""
+    if cfg.QDRANT_URL:
+        return QdrantClient(url=cfg.QDRANT_URL, api_key=cfg.QDRANT_API_KEY or None)
+    return QdrantClient(path=cfg.QDRANT_PATH)
+
+
+def build_quantization_config(cfg) -> Optional[models.QuantizationConfig]:
+    mode = cfg.QDRANT_QUANTIZATION.lower()
+    if mode == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=cfg.QDRANT_QUANTIZATION_ALWAYS_RAM,
+            )
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=cfg.QDRANT_QUANTIZATION_ALWAYS_RAM)
+        )
+    if mode not in ("", "none"):
+        raise ValueError(f"Unsupported QDRANT_QUANTIZATION '{cfg.QDRANT_QUANTIZATION}'; use none, scalar or binary.")
+    return None
+
+
+def build_hnsw_config(cfg) -> Optional[models.HnswConfigDiff]:
+    if cfg.QDRANT_HNSW_M is None and cfg.QDRANT_HNSW_EF_CONSTRUCT is None:
+        return None
+    return models.HnswConfigDiff(m=cfg.QDRANT_HNSW_M, ef_construct=cfg.QDRANT_HNSW_EF_CONSTRUCT)
+
+
+def build_collection_kwargs(cfg, vector_size: int) -> dict:
+    """Keyword arguments for `QdrantClient.create_collection`."""
+    return {
+        "vectors_config": models.VectorParams(
+            size=vector_size,
+            distance=models.Distance.COSINE,
+            on_disk=cfg.QDRANT_ON_DISK_VECTORS or None,
+        ),
+        "hnsw_config": build_hnsw_config(cfg),
+        "quantization_config": build_quantization_config(cfg),
+        "on_disk_payload": cfg.QDRANT_ON_DISK_PAYLOAD or None,
+    }
+
+
+def apply_collection_tuning(client: QdrantClient, collection_name: str, cfg) -> None:
+    """
+    Brings an existing collection in line with the configured quantization,
+    HNSW and on-disk settings. Qdrant rebuilds the affected structures in the
+    background.
+    """
+    quantization = build_quantization_config(cfg)
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=cfg.QDRANT_ON_DISK_VECTORS)},
+        hnsw_config=build_hnsw_config(cfg),
+        quantization_config=quantization if quantization is not None else models.Disabled.DISABLED,
+        collection_params=models.CollectionParamsDiff(on_disk_payload=cfg.QDRANT_ON_DISK_PAYLOAD),
+    )
+
+
+def build_search_params(cfg) -> Optional[models.SearchParams]:
+    """
+    Search-time parameters: HNSW `ef`, and for quantized collections a
+    quantized first pass over `oversampling * limit` candidates that are then
+    rescored with the full-precision vectors.
+    """
+    quantization = None
+    if build_quantization_config(cfg) is not None:
+        quantization = models.QuantizationSearchParams(
+            ignore=False,
+            rescore=cfg.QDRANT_QUANTIZATION_RESCORE,
+            oversampling=cfg.QDRANT_QUANTIZATION_OVERSAMPLING,
+        )
+    if cfg.QDRANT_HNSW_EF is None and quantization is None:
+        return None
+    return models.SearchParams(hnsw_ef=cfg.QDRANT_HNSW_EF, quantization=quantization)
+
+
+# ==============================================================================
+# Async Data Access
+# ==============================================================================
+
+class QdrantAccess:
+    """
+    Async data-access layer over a synchronous QdrantClient.
+
+    The embedded Qdrant (`QdrantClient(path=...)`) only has a blocking API, so
+    every call is run on a small dedicated thread pool instead of the aiohttp
+    event loop. Audio forwarding for other calls keeps flowing while a lookup
+    is in progress, and the pool size bounds how many lookups hit the index at
+    once. Each operation has its own timeout; on expiry `asyncio.TimeoutError`
+    is raised to the caller (the worker thread finishes in the background).
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        max_workers: int = 4,
+        search_timeout: float = 2.0,
+        retrieve_timeout: float = 1.0,
+        search_params: Optional[models.SearchParams] = None,
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.search_timeout = search_timeout
+        self.retrieve_timeout = retrieve_timeout
+        self.search_params = search_params
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qdrant")
+
+    async def _run(self, operation: str, timeout: Optional[float], fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Qdrant {operation} timed out after {timeout}s.")
+            raise
+
+    async def query_points(
+        self,
+        vector: List[float],
+        limit: int,
+        score_threshold: Optional[float] = None,
+        with_vectors: bool = False,
+        **kwargs,
+    ) -> list:
+        """Nearest-neighbour search; returns the scored points, best first."""
+        response = await self._run(
+            "search",
+            self.search_timeout,
+            self.client.query_points,
+            collection_name=self.collection_name,
+            query=vector,
+            limit=limit,
+            score_threshold=score_threshold,
+            with_payload=True,
+            with_vectors=with_vectors,
+            search_params=kwargs.pop("search_params", self.search_params),
+            **kwargs,
+        )
+        return response.points
+
+    async def retrieve(self, ids: Sequence[str], with_payload: bool = True) -> list:
+        """Fetches points by ID."""
+        return await self._run(
+            "retrieve",
+            self.retrieve_timeout,
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=list(ids),
+            with_payload=with_payload,
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,13 +1,19 @@
 import logging
 from pydantic import BaseModel, Field
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 
 # Import the ToolResult classes from rtmt
 from rtmt import ToolResult, ToolResultDirection
 
 from langchain_core.documents import Document
-from langchain_core.runnables import RunnableLambda
-from qdrant_client import QdrantClient
+
+from chunk_store import ChunkStore
+from evidence_cache import SemanticEvidenceCache
+from evidence_compressor import compress_evidence
+from retrieval import ScoredRetriever
+
+if TYPE_CHECKING:
+    from qdrant_access import QdrantAccess
 
 
 # Configure a logger for this module
@@ -29,115 +35,125 @@ class ReportGroundingInput(BaseModel):
     )
 
 # ==============================================================================
-# 2. RAG Chain Construction
+# 2. Evidence Formatting
 # ==============================================================================
 
-def format_docs_with_sources(docs: List[Document]) -> str:
+def format_docs_with_sources(docs: List[Document], query: str = "", token_budget: int = 0) -> str:
     """
     Formats a list of retrieved documents into a single string,
     prefixing each with its source ID. This is the "evidence" that will be
     sent to the main conversational model.
+
+    With a `token_budget`, the chunks are first compressed to the sentences
+    most relevant to `query` (see evidence_compressor), so the evidence stays
+    about that size however many chunks were retrieved.
     """
-    # This will print the raw documents returned by the retriever to your terminal.
-    print(f"DEBUG: Documents received by formatter: {docs}")
-    # ----------------------------
+    logger.debug("Documents received by formatter: %s", docs)
+
+    if token_budget > 0:
+        passages = compress_evidence(query, docs, token_budget)
+    else:
+        passages = [(doc, doc.page_content) for doc in docs]
 
     formatted_chunks = []
-    for doc in docs:
+    for doc, text in passages:
         source_id = doc.metadata.get("_id", "unknown_source")
-        formatted_chunks.append(f"[{source_id}]: {doc.page_content}")
+        formatted_chunks.append(f"[{source_id}]: {text}")
     return "\n-----\n".join(formatted_chunks)
 
-def create_rag_chain(retriever):
-    """
-    Creates a Retrieval and Formatting chain using LCEL.
-    
-    This chain's ONLY job is to retrieve relevant documents and format them
-    into a string of evidence for the main model. The final answer synthesis
-    is handled by the main real-time model, not this chain.
-    """
-    # THE FIX: The chain now stops after retrieving and formatting documents.
-    # It no longer calls the 'base_llm' to synthesize an answer.
-    rag_chain = (
-        retriever
-        | RunnableLambda(format_docs_with_sources)
-
-    )
-    return rag_chain
-
 # ==============================================================================
 # 3. Tool Implementation Functions
 # ==============================================================================
 # These are the actual Python functions that will be executed when the AI decides to use one of our tools. 
 # They must be asynchronous.
 
-async def search_implementation(query: str, retriever) -> ToolResult:
+async def search_implementation(
+    query: str,
+    retriever: ScoredRetriever,
+    evidence_cache: Optional[SemanticEvidenceCache] = None,
+    evidence_token_budget: int = 0,
+) -> ToolResult:
     """
-    Executes the RAG chain for a given query and returns a ToolResult.
+    Runs a single scored retrieval for the query and returns the formatted
+    evidence as a ToolResult. The same results feed the debug logging, so the
+    query is embedded and searched only once. With an `evidence_cache`, the
+    query embedding is looked up first and a close enough past query's
+    evidence is returned without searching.
     """
     logger.info(f"Executing RAG search for query: '{query}'")
 
-    # --- START of logging block ---
+    query_vector = None
+    embedded = False
     try:
-        # Directly query the vector store to get documents WITH their scores for debugging.
-        # This gives us insight into the retriever's confidence.
-        retrieved_docs_with_scores = await retriever.vectorstore.asimilarity_search_with_relevance_scores(
-            query,
-            k=retriever.search_kwargs.get("k", 3)
-        )
-
-        logger.info("--- [DEBUG] Top Retrieved Documents with Scores ---")
-        if not retrieved_docs_with_scores:
-            logger.warning("  - Retriever returned NO documents.")
-        else:
-            for doc, score in retrieved_docs_with_scores:
-                # Log the relevance score (higher is better for most stores)
-                logger.info(f"  - Score: {score:.4f}")
-                logger.info(f"  - Source: {doc.metadata.get('source', 'N/A')}, Page: {doc.metadata.get('page', 'N/A')}")
-                # Log a snippet of the content to see what the retriever "thought" was relevant
-                logger.info(f"  - Content Snippet: {doc.page_content[:150].replace('\n', ' ')}...")
-        logger.info("-------------------------------------------------")
-
+        if evidence_cache is not None and evidence_cache.enabled:
+            # None only when hybrid retrieval gave up on the embedding; the search
+            # below is then lexical-only rather than waiting for it a second time.
+            query_vector = await retriever.embed_query(query)
+            embedded = True
+            if query_vector is not None:
+                cached = evidence_cache.get(query_vector)
+                if cached is not None:
+                    logger.info("Answered from the semantic evidence cache.")
+                    return ToolResult(cached, ToolResultDirection.TO_SERVER)
+        retrieved_docs_with_scores = await retriever.asearch(query, query_vector=query_vector, embed=not embedded)
     except Exception as e:
-        # If the debug logging fails for any reason, we log the error but don't crash the main RAG flow.
-        logger.error(f"  - [DEBUG] Error during direct similarity search: {e}")
-    # --- END of logging block ---
-
-    try:
-        retrieved_docs = await retriever.ainvoke(query)
-        result = format_docs_with_sources(retrieved_docs)
-        return ToolResult(result, ToolResultDirection.TO_SERVER)
-    except Exception as e:
-        logger.error(f"Error during RAG chain execution: {e}", exc_info=True)
+        logger.error(f"Error during RAG retrieval: {e}", exc_info=True)
         error_message = "I encountered an error while searching the knowledge base."
         return ToolResult(error_message, ToolResultDirection.TO_SERVER)
 
-async def report_grounding_implementation(source_ids: List[str], qdrant_client: QdrantClient, collection_name: str) -> ToolResult:
+    logger.info("--- [DEBUG] Top Retrieved Documents with Scores ---")
+    if not retrieved_docs_with_scores:
+        logger.warning("  - Retriever returned NO documents.")
+    else:
+        for doc, score in retrieved_docs_with_scores:
+            # Log the relevance score (cosine similarity, or the fused RRF score in hybrid mode; higher is better)
+            logger.info(f"  - Score: {score:.4f}")
+            logger.info(f"  - Source: {doc.metadata.get('source', 'N/A')}, Page: {doc.metadata.get('page', 'N/A')}")
+            # Log a snippet of the content to see what the retriever "thought" was relevant
+            snippet = doc.page_content[:150].replace("\n", " ")
+            logger.info(f"  - Content Snippet: {snippet}...")
+    logger.info("-------------------------------------------------")
+
+    result = format_docs_with_sources(
+        [doc for doc, _ in retrieved_docs_with_scores],
+        query=query,
+        token_budget=evidence_token_budget,
+    )
+    # Partial (lexical-only) or empty results are not worth repeating for similar questions.
+    if evidence_cache is not None and query_vector is not None and retrieved_docs_with_scores:
+        evidence_cache.put(query_vector, result)
+    return ToolResult(result, ToolResultDirection.TO_SERVER)
+
+async def report_grounding_implementation(source_ids: List[str], qdrant: "QdrantAccess", chunk_store: ChunkStore) -> ToolResult:
     """
-    Retrieves document chunks from Qdrant and returns a ToolResult.
+    Resolves grounding sources from the in-memory chunk store and falls back
+    to Qdrant (off the event loop) only for IDs the store doesn't have.
     """
     logger.info(f"Retrieving grounding sources for IDs: {source_ids}")
     docs = {"sources": []}
     if not source_ids:
         return ToolResult(docs, ToolResultDirection.TO_CLIENT)
-    
-    try:
-        points = qdrant_client.retrieve(
-            collection_name=collection_name,
-            ids=source_ids,
-            with_payload=True
-        )
-        
-        formatted_points = [
-            {
-                "chunk_id": point.id,
-                "title": point.payload.get("metadata", {}).get("source", "Unknown Source"),
-                "chunk": point.payload.get("page_content", "")
-            }
-            for point in points
-        ]
-        docs = {"sources": formatted_points}
-    except Exception as e:
-        logger.error(f"Error retrieving grounding sources from Qdrant: {e}", exc_info=True)
-    
-    return ToolResult(docs, ToolResultDirection.TO_CLIENT)
\ No newline at end of file
+
+    found, missing = chunk_store.get_many(source_ids)
+    formatted_points = [
+        {"chunk_id": chunk_id, "title": title, "chunk": text}
+        for chunk_id, (title, text) in found.items()
+    ]
+
+    if missing:
+        logger.info(f"  - {len(missing)} grounding ID(s) not in chunk store, falling back to Qdrant.")
+        try:
+            points = await qdrant.retrieve(missing)
+            formatted_points.extend(
+                {
+                    "chunk_id": point.id,
+                    "title": point.payload.get("metadata", {}).get("source", "Unknown Source"),
+                    "chunk": point.payload.get("page_content", "")
+                }
+                for point in points
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving grounding sources from Qdrant: {e}", exc_info=True)
+
+    docs = {"sources": formatted_points}
+    return ToolResult(docs, ToolResultDirection.TO_CLIENT)
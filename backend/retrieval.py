@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from chunk_store import ChunkStore
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from metrics import RETRIEVAL_STAGE_SECONDS, timed
+
+if TYPE_CHECKING:
+    from qdrant_access import QdrantAccess
+
+logger = logging.getLogger("voicerag.retrieval")
+
+# Payload keys written by langchain_qdrant.QdrantVectorStore at ingestion time.
+CONTENT_KEY = "page_content"
+METADATA_KEY = "metadata"
+
+ScoredDocument = Tuple[Document, float]
+
+
+def point_to_document(point, collection_name: str) -> Document:
+    """
+    Rebuilds a LangChain Document from a Qdrant point, mirroring what
+    QdrantVectorStore does so downstream code sees the same metadata
+    (including the `_id` used as the chunk's source ID).
+    """
+    payload = point.payload or {}
+    metadata = dict(payload.get(METADATA_KEY) or {})
+    metadata["_id"] = point.id
+    metadata["_collection_name"] = collection_name
+    return Document(page_content=payload.get(CONTENT_KEY, ""), metadata=metadata)
+
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Greedily picks `k` candidate indices balancing similarity to the query
+    against similarity to what has already been picked.
+    """
+    if len(candidate_vectors) == 0 or k <= 0:
+        return []
+
+    def _normalize(m: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(m, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return m / norms
+
+    candidates = _normalize(candidate_vectors)
+    query_sims = candidates @ _normalize(query_vector.reshape(1, -1))[0]
+
+    selected = [int(np.argmax(query_sims))]
+    while len(selected) < min(k, len(candidates)):
+        redundancy = (candidates @ candidates[selected].T).max(axis=1)
+        mmr_scores = lambda_mult * query_sims - (1 - lambda_mult) * redundancy
+        mmr_scores[selected] = -np.inf
+        selected.append(int(np.argmax(mmr_scores)))
+    return selected
+
+
+class ScoredRetriever:
+    """
+    Single-pass retrieval against the Qdrant collection.
+
+    Each call embeds the query once and runs exactly one Qdrant search,
+    returning `(Document, score)` pairs, best first. Results below
+    `score_threshold` (cosine similarity) are dropped, and MMR
+    diversification can be enabled per instance or per call.
+
+    With a BM25 `lexical_index` (and the chunk store to materialize its hits)
+    retrieval is hybrid: dense and lexical rankings are fused with reciprocal
+    rank fusion and the score is the fused RRF score. The embedding call then
+    gets `embedding_timeout` seconds; if it is slower than that or fails,
+    the lexical ranking is returned on its own.
+    """
+
+    def __init__(
+        self,
+        qdrant: "QdrantAccess",
+        embeddings: Embeddings,
+        k: int = 1,
+        score_threshold: Optional[float] = None,
+        use_mmr: bool = False,
+        mmr_fetch_k: int = 20,
+        mmr_lambda: float = 0.5,
+        lexical_index: Optional[BM25Index] = None,
+        chunk_store: Optional[ChunkStore] = None,
+        hybrid_candidates: int = 10,
+        rrf_k: int = 60,
+        embedding_timeout: Optional[float] = None,
+    ):
+        self.qdrant = qdrant
+        self.embeddings = embeddings
+        self.k = k
+        self.score_threshold = score_threshold
+        self.use_mmr = use_mmr
+        self.mmr_fetch_k = mmr_fetch_k
+        self.mmr_lambda = mmr_lambda
+        self.set_local_indexes(lexical_index, chunk_store)
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.embedding_timeout = embedding_timeout
+
+    def set_local_indexes(self, lexical_index: Optional[BM25Index], chunk_store: Optional[ChunkStore]) -> None:
+        """Swaps in the BM25 index and chunk store, e.g. after re-ingestion."""
+        self.lexical_index = lexical_index if lexical_index is not None and len(lexical_index) > 0 else None
+        self.chunk_store = chunk_store
+
+    @property
+    def hybrid(self) -> bool:
+        return self.lexical_index is not None and self.chunk_store is not None
+
+    async def embed_query(self, query: str) -> Optional[List[float]]:
+        """
+        Embeds the query. In hybrid mode a slow or failing embedding returns
+        None instead; a timed-out request keeps running in the background so
+        its vector still lands in the query cache.
+        """
+        if not self.hybrid:
+            with timed(RETRIEVAL_STAGE_SECONDS, "embedding"):
+                return await self.embeddings.aembed_query(query)
+        task = asyncio.ensure_future(self.embeddings.aembed_query(query))
+        try:
+            with timed(RETRIEVAL_STAGE_SECONDS, "embedding"):
+                return await asyncio.wait_for(asyncio.shield(task), timeout=self.embedding_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Query embedding exceeded {self.embedding_timeout}s budget; using lexical retrieval only.")
+        except Exception as e:
+            logger.warning(f"Query embedding failed ({e}); using lexical retrieval only.")
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return None
+
+    async def _dense_search(self, query_vector: List[float], k: int, score_threshold: Optional[float], use_mmr: bool) -> List[ScoredDocument]:
+        limit = max(self.mmr_fetch_k, k) if use_mmr else k
+        with timed(RETRIEVAL_STAGE_SECONDS, "qdrant"):
+            points = await self.qdrant.query_points(query_vector, limit, score_threshold=score_threshold, with_vectors=use_mmr)
+
+        if use_mmr and len(points) > k:
+            picked = maximal_marginal_relevance(
+                np.asarray(query_vector, dtype=np.float32),
+                np.asarray([point.vector for point in points], dtype=np.float32),
+                k=k,
+                lambda_mult=self.mmr_lambda,
+            )
+            points = [points[i] for i in picked]
+
+        return [(point_to_document(point, self.qdrant.collection_name), point.score) for point in points]
+
+    def _lexical_document(self, chunk_store: ChunkStore, chunk_id: str) -> Optional[Document]:
+        entry = chunk_store.get(chunk_id)
+        if entry is None:
+            return None
+        title, text = entry
+        return Document(
+            page_content=text,
+            metadata={"source": title, "_id": chunk_id, "_collection_name": self.qdrant.collection_name},
+        )
+
+    async def asearch(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        use_mmr: Optional[bool] = None,
+        query_vector: Optional[List[float]] = None,
+        embed: bool = True,
+    ) -> List[ScoredDocument]:
+        """
+        Returns up to `k` documents for `query` with their relevance scores,
+        best first. Arguments left as None fall back to the instance defaults;
+        `query_vector` reuses an embedding the caller already got from `embed_query`.
+        Pass `embed=False` when that call returned None: hybrid retrieval then
+        goes lexical-only at once instead of waiting out the budget again.
+        """
+        k = k if k is not None else self.k
+        score_threshold = score_threshold if score_threshold is not None else self.score_threshold
+        use_mmr = use_mmr if use_mmr is not None else self.use_mmr
+
+        if not self.hybrid:
+            if query_vector is None:
+                query_vector = await self.embed_query(query)
+            return await self._dense_search(query_vector, k, score_threshold, use_mmr)
+
+        # Held for the whole search: the indexes may be swapped while it awaits.
+        chunk_store = self.chunk_store
+        candidates = max(k, self.hybrid_candidates)
+        with timed(RETRIEVAL_STAGE_SECONDS, "lexical"):
+            lexical_hits = self.lexical_index.search(query, candidates)
+
+        dense_results: List[ScoredDocument] = []
+        if query_vector is None and embed:
+            query_vector = await self.embed_query(query)
+        if query_vector is not None:
+            try:
+                dense_results = await self._dense_search(query_vector, candidates, score_threshold, use_mmr)
+            except Exception as e:
+                logger.warning(f"Dense search failed ({e}); using lexical retrieval only.")
+
+        dense_docs = {str(doc.metadata["_id"]): doc for doc, _ in dense_results}
+        fused = reciprocal_rank_fusion(
+            [list(dense_docs), [chunk_id for chunk_id, _ in lexical_hits]],
+            k=self.rrf_k,
+        )
+
+        results: List[ScoredDocument] = []
+        for chunk_id, score in fused:
+            doc = dense_docs.get(chunk_id) or self._lexical_document(chunk_store, chunk_id)
+            if doc is not None:
+                results.append((doc, score))
+            if len(results) >= k:
+                break
+        return results
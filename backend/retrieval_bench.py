@@ -0,0 +1,363 @@
+"""
+Offline retrieval quality and latency benchmark.
+
+Runs a labeled query set through the same ScoredRetriever the app uses and
+reports recall@k, MRR and latency percentiles for one or more
+configurations side by side:
+
+    python retrieval_bench.py retrieval_queries.example.jsonl \\
+        --config baseline --config "k3:RETRIEVAL_K=3" --config "small:CHUNK_SIZE=500,CHUNK_OVERLAP=100"
+
+With `--embeddings hash` everything runs offline: chunks are re-indexed into
+a temporary collection with the deterministic HashEmbeddings stand-in.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient, models
+
+from chunk_store import ChunkStore, write_chunk_store
+from config import Settings, settings
+from lexical_index import BM25Index
+from local_embeddings import HashEmbeddings
+from qdrant_access import QdrantAccess, build_collection_kwargs, build_search_params
+from retrieval import ScoredRetriever
+
+logger = logging.getLogger("voicerag.retrieval_bench")
+
+# Settings that change what is indexed; any other setting only changes the search.
+INDEX_SETTINGS = ("CHUNK_SIZE", "CHUNK_OVERLAP", "QDRANT_QUANTIZATION", "QDRANT_HNSW_M", "QDRANT_HNSW_EF_CONSTRUCT", "QDRANT_ON_DISK_VECTORS", "QDRANT_ON_DISK_PAYLOAD")
+
+
+# ==============================================================================
+# 1. Query Set & Configurations
+# ==============================================================================
+
+class LabeledQuery:
+    """
+    A benchmark query and what a correct answer must come from: source file
+    names (matched against the chunk's `metadata.source` file name) and/or
+    product names (matched case-insensitively in the chunk text).
+    """
+
+    def __init__(self, query: str, sources: List[str], products: List[str]):
+        if not sources and not products:
+            raise ValueError(f"Query '{query}' has no expected sources or products.")
+        self.query = query
+        self.sources = [s.casefold() for s in sources]
+        self.products = [p.casefold() for p in products]
+
+    def labels_found(self, doc: Document) -> set:
+        """The expected labels this document satisfies."""
+        found = set()
+        source = Path(str(doc.metadata.get("source", ""))).name.casefold()
+        if source in self.sources:
+            found.add(("source", source))
+        text = doc.page_content.casefold()
+        found.update(("product", p) for p in self.products if p in text)
+        return found
+
+    @property
+    def label_count(self) -> int:
+        return len(self.sources) + len(self.products)
+
+
+def load_query_set(path: Path) -> List[LabeledQuery]:
+    """Reads a JSON list or JSONL file of {"query", "sources", "products"} objects."""
+    text = Path(path).read_text(encoding="utf-8").strip()
+    rows = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [LabeledQuery(row["query"], row.get("sources", []), row.get("products", [])) for row in rows]
+
+
+def parse_config(spec: str) -> Tuple[str, Settings]:
+    """Parses `NAME[:KEY=VALUE,...]` into a Settings copy with those overrides."""
+    name, _, assignments = spec.partition(":")
+    overrides = {}
+    for assignment in filter(None, (a.strip() for a in assignments.split(","))):
+        key, _, value = assignment.partition("=")
+        if key not in Settings.model_fields:
+            raise ValueError(f"Unknown setting '{key}' in config '{name}'.")
+        overrides[key] = value
+    # Init arguments take precedence over .env and the environment, and are validated.
+    return name, Settings(**overrides)
+
+
+# ==============================================================================
+# 2. Indexes
+# ==============================================================================
+
+class BenchIndex:
+    """A Qdrant collection plus the chunk store and BM25 index retrieval reads."""
+
+    def __init__(self, client: QdrantClient, collection_name: str, chunk_store: ChunkStore, lexical_index: Optional[BM25Index], description: str):
+        self.client = client
+        self.collection_name = collection_name
+        self.chunk_store = chunk_store
+        self.lexical_index = lexical_index
+        self.description = description
+
+    def close(self) -> None:
+        self.chunk_store.close()
+        self.client.close()
+
+
+def open_ingested_index(cfg: Settings) -> BenchIndex:
+    """The collection built by ingest.py, read in place."""
+    root = Path(cfg.QDRANT_PATH)
+    return BenchIndex(
+        QdrantClient(path=str(root)),
+        cfg.QDRANT_COLLECTION_NAME,
+        ChunkStore(root / cfg.CHUNK_STORE_FILENAME),
+        BM25Index.load(root / cfg.LEXICAL_INDEX_FILENAME),
+        f"ingested collection '{cfg.QDRANT_COLLECTION_NAME}'",
+    )
+
+
+def iter_chunk_records(cfg: Settings) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yields (chunk_id, source, text) for the knowledge base chunked with
+    `cfg`. The ingested chunk store is reused when the chunking matches what
+    ingest.py used; otherwise DATA_PATH is re-split with ingest's pipeline.
+    """
+    if cfg.CHUNK_SIZE == settings.CHUNK_SIZE and cfg.CHUNK_OVERLAP == settings.CHUNK_OVERLAP:
+        store = ChunkStore(Path(settings.QDRANT_PATH) / settings.CHUNK_STORE_FILENAME)
+        if len(store) > 0:
+            try:
+                yield from store.items()
+                return
+            finally:
+                store.close()
+        store.close()
+
+    # Imported lazily: the document loaders are heavy and only needed to re-chunk.
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    import ingest
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=cfg.CHUNK_SIZE, chunk_overlap=cfg.CHUNK_OVERLAP)
+    tabular = [name.strip() for name in cfg.TABULAR_PDF_FILES.split(",") if name.strip()]
+    files = sorted(str(p) for p in Path(cfg.DATA_PATH).rglob("*") if p.is_file())
+    for item in ingest.iter_file_chunks(files, splitter, tabular, Path(cfg.DATA_PATH), previous_ids={}, workers=cfg.INGEST_WORKERS or 1):
+        if isinstance(item, ingest.FileDone):
+            continue
+        point_id, chunk = item
+        yield point_id, str(chunk.metadata.get("source", "Unknown Source")), chunk.page_content
+
+
+async def _embed_documents(texts: List[str], mode: str, dimensions: int) -> List[List[float]]:
+    if mode == "hash":
+        return HashEmbeddings(dimensions).embed_documents(texts)
+
+    from openai import AsyncAzureOpenAI
+
+    from embedding_disk_cache import DiskEmbeddingCache
+    from embedding_scheduler import EmbeddingScheduler
+
+    scheduler = EmbeddingScheduler(
+        AsyncAzureOpenAI(
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_EMBEDDING_API_VERSION,
+            max_retries=0,
+        ),
+        deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+        max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+        max_retries=settings.EMBEDDING_MAX_RETRIES,
+        cache=DiskEmbeddingCache(
+            Path(settings.EMBEDDING_CACHE_PATH),
+            settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            dimensions,
+        ) if settings.EMBEDDING_CACHE_PATH else None,
+    )
+    return await scheduler.embed(texts)
+
+
+async def build_index(cfg: Settings, mode: str, dimensions: int, root: Path) -> BenchIndex:
+    """Indexes the knowledge base into a fresh collection under `root`."""
+    records = list(iter_chunk_records(cfg))
+    if not records:
+        raise RuntimeError("No chunks to index; run 'python ingest.py' first or check DATA_PATH.")
+    vectors = await _embed_documents([text for _, _, text in records], mode, dimensions)
+
+    root.mkdir(parents=True, exist_ok=True)
+    collection_name = "retrieval_bench"
+    client = QdrantClient(path=str(root))
+    client.create_collection(collection_name, **build_collection_kwargs(cfg, dimensions))
+    for start in range(0, len(records), 256):
+        client.upsert(
+            collection_name,
+            points=[
+                models.PointStruct(id=chunk_id, vector=vector, payload={"page_content": text, "metadata": {"source": source}})
+                for (chunk_id, source, text), vector in zip(records[start:start + 256], vectors[start:start + 256])
+            ],
+        )
+    write_chunk_store(root / cfg.CHUNK_STORE_FILENAME, records)
+    lexical_index = BM25Index.build((chunk_id, text) for chunk_id, _, text in records)
+    logger.info(f"Indexed {len(records)} chunks (chunk size {cfg.CHUNK_SIZE}, overlap {cfg.CHUNK_OVERLAP}, {mode} embeddings).")
+    return BenchIndex(
+        client,
+        collection_name,
+        ChunkStore(root / cfg.CHUNK_STORE_FILENAME),
+        lexical_index,
+        f"{len(records)} chunks @ {cfg.CHUNK_SIZE}/{cfg.CHUNK_OVERLAP}",
+    )
+
+
+# ==============================================================================
+# 3. Evaluation
+# ==============================================================================
+
+def make_retriever(cfg: Settings, index: BenchIndex, embeddings) -> Tuple[ScoredRetriever, QdrantAccess]:
+    access = QdrantAccess(
+        index.client,
+        index.collection_name,
+        max_workers=cfg.QDRANT_MAX_WORKERS,
+        search_timeout=None,
+        retrieve_timeout=None,
+        search_params=build_search_params(cfg),
+    )
+    retriever = ScoredRetriever(
+        qdrant=access,
+        embeddings=embeddings,
+        k=cfg.RETRIEVAL_K,
+        score_threshold=cfg.RETRIEVAL_SCORE_THRESHOLD,
+        use_mmr=cfg.RETRIEVAL_USE_MMR,
+        mmr_fetch_k=cfg.RETRIEVAL_MMR_FETCH_K,
+        mmr_lambda=cfg.RETRIEVAL_MMR_LAMBDA,
+        lexical_index=index.lexical_index if cfg.RETRIEVAL_HYBRID else None,
+        chunk_store=index.chunk_store,
+        hybrid_candidates=cfg.RETRIEVAL_HYBRID_CANDIDATES,
+        rrf_k=cfg.RETRIEVAL_RRF_K,
+        # Quality is measured without the latency budget's lexical fallback.
+        embedding_timeout=None,
+    )
+    return retriever, access
+
+
+async def evaluate(cases: List[LabeledQuery], retriever: ScoredRetriever, ks: List[int], verbose: bool = False) -> Dict[str, float]:
+    """
+    Scores every query. Latency is timed on the production-shaped call
+    (the config's own k); ranking metrics use a second call `max(ks)` deep.
+    """
+    depth = max(max(ks), retriever.k)
+    await retriever.asearch(cases[0].query)  # warm-up, not timed
+
+    latencies, reciprocal_ranks = [], []
+    recalls = {k: [] for k in ks}
+    for case in cases:
+        started = time.perf_counter()
+        await retriever.asearch(case.query)
+        latencies.append(time.perf_counter() - started)
+
+        ranked = [doc for doc, _ in await retriever.asearch(case.query, k=depth)]
+        first_hit = next((rank for rank, doc in enumerate(ranked, start=1) if case.labels_found(doc)), None)
+        reciprocal_ranks.append(1.0 / first_hit if first_hit else 0.0)
+        for k in ks:
+            covered = set().union(*(case.labels_found(doc) for doc in ranked[:k])) if ranked[:k] else set()
+            recalls[k].append(len(covered) / case.label_count)
+        if verbose:
+            print(f"  rank={first_hit or '-':>3}  {latencies[-1] * 1000:7.1f} ms  {case.query}")
+
+    result = {f"recall@{k}": float(np.mean(recalls[k])) for k in ks}
+    result["MRR"] = float(np.mean(reciprocal_ranks))
+    for q in (50, 95, 99):
+        result[f"p{q} ms"] = float(np.percentile(latencies, q) * 1000)
+    return result
+
+
+def print_table(results: Dict[str, Dict[str, float]], descriptions: Dict[str, str]) -> None:
+    names = list(results)
+    metrics = list(next(iter(results.values())))
+    width = max(12, *(len(n) for n in names)) + 2
+    print()
+    print(f"{'':<14}" + "".join(f"{n:>{width}}" for n in names))
+    for metric in metrics:
+        formatted = [f"{results[n][metric]:.1f}" if metric.endswith("ms") else f"{results[n][metric]:.3f}" for n in names]
+        print(f"{metric:<14}" + "".join(f"{v:>{width}}" for v in formatted))
+    print()
+    for name in names:
+        print(f"  {name}: {descriptions[name]}")
+
+
+# ==============================================================================
+# 4. Entry Point
+# ==============================================================================
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    cases = load_query_set(args.queries)
+    configs = [parse_config(spec) for spec in (args.config or ["baseline"])]
+    ks = sorted({int(k) for k in args.at.split(",")})
+
+    if args.embeddings == "hash":
+        embeddings = HashEmbeddings(args.dim)
+        dimensions = args.dim
+    else:
+        from langchain_openai import AzureOpenAIEmbeddings
+        embeddings = AzureOpenAIEmbeddings(
+            azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_version=settings.AZURE_OPENAI_EMBEDDING_API_VERSION,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            check_embedding_ctx_length=False,
+        )
+        dimensions = settings.EMBEDDING_DIMENSIONS
+
+    results: Dict[str, Dict[str, float]] = {}
+    descriptions: Dict[str, str] = {}
+    indexes: Dict[tuple, BenchIndex] = {}
+    with tempfile.TemporaryDirectory(prefix="voicerag-bench-") as tmp:
+        try:
+            for name, cfg in configs:
+                index_key = tuple(getattr(cfg, key) for key in INDEX_SETTINGS)
+                if index_key not in indexes:
+                    unchanged = all(getattr(cfg, key) == getattr(settings, key) for key in INDEX_SETTINGS)
+                    if args.embeddings == "azure" and unchanged:
+                        indexes[index_key] = open_ingested_index(cfg)
+                    else:
+                        indexes[index_key] = await build_index(cfg, args.embeddings, dimensions, Path(tmp) / f"index{len(indexes)}")
+                index = indexes[index_key]
+
+                retriever, access = make_retriever(cfg, index, embeddings)
+                print(f"Evaluating '{name}' on {len(cases)} queries ({index.description})...")
+                try:
+                    results[name] = await evaluate(cases, retriever, ks, verbose=args.verbose)
+                finally:
+                    access.close()
+                mode = "hybrid" if retriever.hybrid else "dense"
+                descriptions[name] = f"{index.description}, k={cfg.RETRIEVAL_K}, {mode}{', mmr' if cfg.RETRIEVAL_USE_MMR else ''}"
+        finally:
+            for index in indexes.values():
+                index.close()
+
+    print_table(results, descriptions)
+    if args.output:
+        Path(args.output).write_text(json.dumps({"configs": descriptions, "results": results}, indent=2), encoding="utf-8")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark.")
+    parser.add_argument("queries", type=Path, help="Labeled query set (JSON list or JSONL).")
+    parser.add_argument("--config", action="append", metavar="NAME[:KEY=VALUE,...]", help="A configuration to compare; repeatable. Defaults to the current settings.")
+    parser.add_argument("--at", default="1,3,5", help="Comma-separated k values for recall@k.")
+    parser.add_argument("--embeddings", choices=["azure", "hash"], default="azure", help="'hash' is a deterministic offline stand-in.")
+    parser.add_argument("--dim", type=int, default=256, help="Dimensions of the hash embeddings.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Print per-query rank and latency.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
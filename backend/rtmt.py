@@ -1,16 +1,123 @@
 import asyncio
+import base64
+import binascii
 import json
 import logging
+import re
+import struct
+import time
+import uuid
+from collections import deque
 from enum import Enum
-from typing import Any, Callable, Optional, Dict, List
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, Dict, List, Tuple, Union
 
 import aiohttp
 from aiohttp import web
 from azure.core.credentials import AzureKeyCredential, AccessToken
-from azure.identity import DefaultAzureCredential
+
+if TYPE_CHECKING:
+    # azure.identity is slow to import; the app only loads it when using Azure AD.
+    from azure.identity import DefaultAzureCredential
+
+from metrics import SESSIONS_QUEUED, SESSIONS_REJECTED_TOTAL, TOOL_SECONDS, SessionMetrics
 
 logger = logging.getLogger("voicerag")
 
+# orjson is markedly faster for the few events that are actually rewritten.
+try:
+    import orjson
+
+    def json_loads(data: str) -> Any:
+        return orjson.loads(data)
+
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+_EVENT_TYPE_RE = re.compile(r'"type"\s*:\s*"([^"\\]*)"')
+# The top-level "type" key comes first in practice, well ahead of any large payload.
+_EVENT_TYPE_PEEK_CHARS = 256
+
+# Events the middle tier inspects or rewrites; everything else is relayed verbatim.
+_SERVER_EVENTS_TO_PROCESS = frozenset({
+    "session.created",
+    "conversation.item.input_audio_transcription.completed",
+    "input_audio_buffer.speech_started",
+    "response.output_item.added",
+    "conversation.item.created",
+    "response.function_call_arguments.delta",
+    "response.function_call_arguments.done",
+    "response.output_item.done",
+    "response.done",
+})
+_CLIENT_EVENTS_TO_PROCESS = frozenset({
+    "session.update",
+})
+_AUDIO_APPEND_EVENT = "input_audio_buffer.append"
+
+# WebSocket subprotocol a client offers on /realtime to receive response audio
+# as binary frames instead of base64 inside JSON deltas. Each frame is
+#   u8 kind (AUDIO_FRAME_DELTA) | u8 item id length N | u16 content index (LE)
+#   | N bytes UTF-8 item id | one zero byte if N is odd | PCM16 LE samples,
+# so the samples start at an even offset and can be viewed as an Int16Array.
+# Every other event is still sent as JSON text.
+BINARY_AUDIO_PROTOCOL = "voicerag.binary-audio.v1"
+AUDIO_FRAME_DELTA = 1
+_AUDIO_FRAME_HEADER = struct.Struct("<BBH")
+
+
+def encode_audio_frame(item_id: str, content_index: int, pcm: bytes) -> bytes:
+    item = item_id.encode("utf-8")[:255]
+    return b"".join((
+        _AUDIO_FRAME_HEADER.pack(AUDIO_FRAME_DELTA, len(item), content_index & 0xFFFF),
+        item,
+        b"\0" if len(item) % 2 else b"",
+        pcm,
+    ))
+
+
+def decode_audio_frame(frame: bytes) -> Tuple[str, int, bytes]:
+    """Inverse of `encode_audio_frame`: returns (item id, content index, PCM)."""
+    kind, length, content_index = _AUDIO_FRAME_HEADER.unpack_from(frame)
+    if kind != AUDIO_FRAME_DELTA:
+        raise ValueError(f"Unknown audio frame kind {kind}")
+    start = _AUDIO_FRAME_HEADER.size
+    item_id = frame[start:start + length].decode("utf-8")
+    return item_id, content_index, frame[start + length + length % 2:]
+
+
+# Pass-through events that only feed the first-audio latency metric.
+_SPEECH_STOPPED_EVENT = "input_audio_buffer.speech_stopped"
+_AUDIO_DELTA_EVENTS = frozenset({"response.audio.delta", "response.output_audio.delta"})
+
+
+def peek_event_type(data: str, strict: bool = False) -> Optional[str]:
+    """
+    Reads a realtime event's top-level `type` from the start of the raw frame
+    without decoding the rest (e.g. a large base64 audio payload). Returns
+    None when the type cannot be located safely, in which case the caller
+    falls back to a full parse.
+
+    Use `strict` for frames from callers. JSON parsers keep the last of
+    duplicate keys, so `{"type": "input_audio_buffer.append", "type":
+    "session.update", ...}` would peek as an append but reach the service as
+    a session.update, skipping the enforced session config. A strict peek
+    gives up when the frame has any other `"type"` key, or any escape that
+    could spell one.
+    """
+    match = _EVENT_TYPE_RE.search(data, 0, _EVENT_TYPE_PEEK_CHARS)
+    if match is None:
+        return None
+    # Only trust a top-level key: nothing may open a nested object or array before it.
+    prefix = data[1:match.start()]
+    if "{" in prefix or "[" in prefix:
+        return None
+    if strict and (data.find('"type"', match.end()) != -1 or "\\" in data):
+        return None
+    return match.group(1)
+
 class ToolResultDirection(Enum):
     TO_SERVER = 1
     TO_CLIENT = 2
@@ -26,7 +133,7 @@ class ToolResult:
     def to_text(self) -> str:
         if self.text is None:
             return ""
-        return self.text if type(self.text) == str else json.dumps(self.text)
+        return self.text if type(self.text) == str else json_dumps(self.text)
 
 class Tool:
     target: Callable[..., ToolResult]
@@ -44,8 +151,364 @@ class RTToolCall:
         self.tool_call_id = tool_call_id
         self.previous_id = previous_id
 
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Filler words that say nothing about what is being searched for.
+_STOPWORDS = frozenset(
+    "a an and are as at be can could do does for from how i in is it me my of on or please "
+    "tell the to us we what when where which who why will with would you your".split()
+)
+
+
+def _query_terms(text: str) -> set[str]:
+    return {w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Overlap coefficient of the content words of two queries (0..1)."""
+    terms_a, terms_b = _query_terms(a), _query_terms(b)
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / min(len(terms_a), len(terms_b))
+
+
+class SpeculativeToolCall:
+    """
+    Per-connection speculative execution of one tool.
+
+    As soon as the user's transcribed turn is known, the tool is started in
+    the background with the transcript as its argument. When the model then
+    calls that tool with a similar argument, the in-flight (or finished)
+    result is reused instead of starting over; otherwise the speculation is
+    cancelled.
+    """
+
+    def __init__(self, tool: Tool, arg_name: str, min_similarity: float):
+        self.tool = tool
+        self.arg_name = arg_name
+        self.min_similarity = min_similarity
+        self.query: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, query: str) -> None:
+        self.cancel()
+        self.query = query
+        self.task = asyncio.create_task(self.tool.target({self.arg_name: query}))
+        # Unused speculations are cancelled or dropped; don't warn about their errors.
+        self.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        logger.info(f"Speculative {self.arg_name} started for transcript: '{query}'")
+
+    def take(self, args: dict) -> Optional[asyncio.Task]:
+        """Hands over the speculation if it matches the model's call, else cancels it."""
+        if self.task is None:
+            return None
+        similarity = query_similarity(self.query, str(args.get(self.arg_name, "")))
+        if similarity >= self.min_similarity:
+            task = self.task
+            self.task, self.query = None, None
+            logger.info(f"Speculative result reused (similarity {similarity:.2f}).")
+            return task
+        logger.info(f"Speculation discarded (similarity {similarity:.2f}).")
+        self.cancel()
+        return None
+
+    def cancel(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task, self.query = None, None
+
+
+class ToolCallRunner:
+    """
+    Per-connection executor for tool calls.
+
+    Each call runs as its own task so upstream messages (audio deltas,
+    transcripts) keep flowing to the browser while tools execute. Calls may
+    finish in any order, but their outputs are delivered in the order the
+    calls arrived. Everything is cancelled on barge-in or disconnect.
+    """
+
+    def __init__(self):
+        self._tasks: set[asyncio.Task] = set()
+        self._last: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def submit(self, run: Callable[[], Awaitable[ToolResult]], deliver: Callable[[ToolResult], Awaitable[None]]) -> asyncio.Task:
+        previous = self._last
+
+        async def _call():
+            result = await run()
+            if previous is not None and not previous.done():
+                # asyncio.wait (unlike gather) won't cancel `previous` if we are cancelled.
+                await asyncio.wait([previous])
+            await deliver(result)
+
+        self._last = self._track(asyncio.create_task(_call()))
+        return self._last
+
+    def after_all(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Runs `callback` once every call submitted so far has delivered its output."""
+        tasks = list(self._tasks)
+
+        async def _wait_then_call():
+            if tasks:
+                await asyncio.wait(tasks)
+            if any(t.cancelled() for t in tasks):
+                return
+            await callback()
+
+        self._track(asyncio.create_task(_wait_then_call()))
+
+    def cancel_all(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        self._last = None
+
+
+class AudioAppendCoalescer:
+    """
+    Per-connection merging of consecutive `input_audio_buffer.append` events.
+
+    Browsers send audio in many small appends. Buffered audio is sent upstream
+    as one append once `window` seconds have passed since the first buffered
+    chunk or `max_bytes` of PCM have accumulated, whichever comes first. Any
+    other event must `flush()` first, so commits, clears and everything else
+    keep their order relative to the audio.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], window: float, max_bytes: int, metrics: SessionMetrics):
+        self._send = send
+        self.window = window
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self._chunks: List[bytes] = []
+        self._size = 0
+        self._event_id: Optional[str] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def append(self, data: str) -> bool:
+        """Buffers an append event; returns False if it has to be forwarded as is."""
+        message = json_loads(data)
+        if not isinstance(message, dict) or not isinstance(message.get("audio"), str) or set(message) - {"type", "audio", "event_id"}:
+            return False
+        try:
+            chunk = base64.b64decode(message["audio"], validate=True)
+        except (binascii.Error, ValueError):
+            return False
+
+        self.metrics.appends_received += 1
+        async with self._lock:
+            if not self._chunks:
+                # Errors about the merged append then refer to its first part.
+                self._event_id = message.get("event_id")
+            self._chunks.append(chunk)
+            self._size += len(chunk)
+            if self._size >= self.max_bytes:
+                await self._flush_locked()
+            elif self._timer is None:
+                self._timer = asyncio.create_task(self._flush_after_window())
+                # A send that fails here fails for the forwarding loop too; don't warn twice.
+                self._timer.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return True
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        async with self._lock:
+            await self._flush_locked()
+
+    async def flush(self) -> None:
+        """Sends any buffered audio now."""
+        if self._chunks:
+            async with self._lock:
+                await self._flush_locked()
+
+    async def _flush_locked(self) -> None:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        if not self._chunks:
+            return
+        event = {"type": _AUDIO_APPEND_EVENT, "audio": base64.b64encode(b"".join(self._chunks)).decode()}
+        if self._event_id is not None:
+            event["event_id"] = self._event_id
+        self._chunks, self._size, self._event_id = [], 0, None
+        self.metrics.appends_sent += 1
+        await self._send(json_dumps(event))
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class RTSession:
+    """
+    State of one relayed call: its sockets, the tool calls it has pending,
+    the tasks running them, its speculation and its counters. Nothing here is
+    shared between calls, so one call's events can never touch another's.
+    """
+
+    def __init__(self, client_ws: web.WebSocketResponse, speculation: Optional[SpeculativeToolCall] = None):
+        self.id = uuid.uuid4().hex
+        self.client_ws = client_ws
+        self.server_ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.tools_pending: Dict[str, RTToolCall] = {}
+        self.tool_runner = ToolCallRunner()
+        self.speculation = speculation
+        self.metrics = SessionMetrics()
+        # Negotiated via BINARY_AUDIO_PROTOCOL: audio deltas go out as binary frames.
+        self.binary_audio = client_ws.ws_protocol == BINARY_AUDIO_PROTOCOL
+
+    def close(self) -> None:
+        self.tool_runner.cancel_all()
+        if self.speculation is not None:
+            self.speculation.cancel()
+        self.tools_pending.clear()
+        self.metrics.close()
+
+
+class SessionRegistry:
+    """
+    Tracks live sessions and admits new ones up to `max_sessions` (0 means
+    unlimited). Beyond the limit up to `max_queued` callers wait, first come
+    first served, for at most `queue_timeout` seconds; anyone else is
+    rejected immediately so an overloaded server fails fast instead of
+    degrading every call.
+    """
+
+    def __init__(self, max_sessions: int = 0, max_queued: int = 0, queue_timeout: float = 10.0):
+        self.max_sessions = max_sessions
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.sessions: Dict[str, RTSession] = {}
+        self._admitted = 0
+        self._waiters: deque = deque()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    async def acquire(self) -> bool:
+        """Reserves a slot for a new call; returns False if it was rejected."""
+        if self.max_sessions <= 0 or (self._admitted < self.max_sessions and not self._waiters):
+            self._admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queued:
+            SESSIONS_REJECTED_TOTAL.inc()
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        SESSIONS_QUEUED.inc()
+        try:
+            # release() hands its slot over by resolving the waiter.
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            SESSIONS_REJECTED_TOTAL.inc()
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            SESSIONS_QUEUED.dec()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._admitted -= 1
+
+    def add(self, session: RTSession) -> None:
+        self.sessions[session.id] = session
+
+    def remove(self, session: RTSession) -> None:
+        self.sessions.pop(session.id, None)
+
+
+class UpstreamPool:
+    """
+    Keeps up to `size` realtime upstream sockets open and configured so a new
+    caller skips the TLS + WebSocket handshake and session setup.
+
+    Sockets older than `max_age` seconds, or closed by the service, are
+    discarded and replaced in the background; when the pool is empty the
+    caller simply connects directly.
+    """
+
+    def __init__(self, open_socket: Callable[[], Awaitable[Tuple[aiohttp.ClientWebSocketResponse, List[aiohttp.WSMessage]]]], size: int, max_age: float):
+        self.open_socket = open_socket
+        self.size = size
+        self.max_age = max_age
+        self._ready: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._maintain())
+
+    def acquire(self) -> Optional[Tuple[aiohttp.ClientWebSocketResponse, List[aiohttp.WSMessage]]]:
+        """Hands out a ready socket (and the events to replay), or None if none is ready."""
+        while self._ready:
+            opened_at, target_ws, replay = self._ready.popleft()
+            self._wakeup.set()
+            if not target_ws.closed and time.monotonic() - opened_at < self.max_age:
+                return target_ws, replay
+            asyncio.create_task(target_ws.close())
+        return None
+
+    async def _maintain(self) -> None:
+        failures = 0
+        while True:
+            # Retire sockets that are about to age out or were closed upstream.
+            while self._ready and (self._ready[0][1].closed or time.monotonic() - self._ready[0][0] >= self.max_age):
+                await self._ready.popleft()[1].close()
+            if len(self._ready) < self.size:
+                try:
+                    target_ws, replay = await self.open_socket()
+                    self._ready.append((time.monotonic(), target_ws, replay))
+                    failures = 0
+                    continue
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failures += 1
+                    logger.warning(f"Could not pre-open upstream realtime socket: {e}")
+            self._wakeup.clear()
+            # Back off after failures; otherwise wake up to retire aged sockets.
+            timeout = min(60.0, 2.0 ** failures) if failures else max(1.0, self.max_age / 4)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        while self._ready:
+            await self._ready.popleft()[1].close()
+
+
+def _default_azure_credential() -> "DefaultAzureCredential":
+    from azure.identity import DefaultAzureCredential
+
+    return DefaultAzureCredential()
+
+
 class RTMiddleTier:
-    def __init__(self, endpoint: str, deployment: str, credentials: AzureKeyCredential | DefaultAzureCredential, voice_choice: Optional[str], turn_detection_config: Optional[Dict[str, Any]] = None):
+    def __init__(self, endpoint: str, deployment: str, credentials: "AzureKeyCredential | DefaultAzureCredential | None", voice_choice: Optional[str], turn_detection_config: Optional[Dict[str, Any]] = None):
         self.endpoint = endpoint
         self.deployment = deployment
         self.voice_choice = voice_choice
@@ -55,7 +518,8 @@ class RTMiddleTier:
         # --- Instance Attributes ---
         self.tools: dict[str, Tool] = {}
         self.tool_schemas: list = []
-        self._tools_pending: dict = {}
+        # Live calls and admission control; limits are set by the application.
+        self.sessions = SessionRegistry()
         
         # --- Server-enforced Configuration ---
         self.model: Optional[str] = None
@@ -64,44 +528,230 @@ class RTMiddleTier:
         self.max_tokens: Optional[int] = None
         self.disable_audio: Optional[bool] = None
 
+        # --- Speculative Tool Execution ---
+        # Name of a tool to start speculatively from the user's transcript, the
+        # argument the transcript is passed as, and how similar the model's
+        # own argument must be for the speculative result to be used.
+        self.speculative_tool: Optional[str] = None
+        self.speculative_arg: str = "query"
+        self.speculation_min_similarity: float = 0.5
+
+        # --- Audio Input Coalescing ---
+        # Consecutive input audio appends are merged for up to this many
+        # seconds or bytes of PCM before going upstream; 0 forwards each one.
+        self.audio_coalesce_window: float = 0.0
+        self.audio_coalesce_max_bytes: int = 19200
+
+        # --- Upstream Connections ---
+        # One HTTP session for the whole app, and optionally a pool of
+        # pre-opened, pre-configured realtime sockets handed to new callers.
+        self.upstream_pool_size: int = 0
+        self.upstream_pool_max_age: float = 300.0
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._upstream_pool: Optional[UpstreamPool] = None
+
         # --- Authentication ---
         self.key: Optional[str] = None
-        self.credentials: Optional[DefaultAzureCredential] = None
+        self.credentials: Optional["DefaultAzureCredential"] = None
+        # Tokens are cached and refreshed this many seconds before they expire.
+        self.token_refresh_margin: float = 300.0
+        self._token: Optional[AccessToken] = None
+        self._token_lock = asyncio.Lock()
+        self._token_refresh: Optional[asyncio.Task] = None
         
+        # None: a DefaultAzureCredential is created on the first token fetch.
         if isinstance(credentials, AzureKeyCredential):
             self.key = credentials.key
         else:
             self.credentials = credentials
 
-    async def _get_token(self) -> str:
+    async def _fetch_token(self) -> AccessToken:
         """
         Gets a token by running the synchronous get_token method in a separate thread.
         This is the correct, non-blocking way to use synchronous client libraries
         within an asyncio application.
         """
-        if not self.credentials:
-            raise TypeError("Token-based authentication requires a credential object.")
-        
+        if self.credentials is None:
+            # Importing azure.identity and building the credential chain take a
+            # while, so it happens here (normally the warm-up) rather than at startup.
+            self.credentials = await asyncio.to_thread(_default_azure_credential)
         # Use asyncio.to_thread to run the blocking, synchronous get_token call
         # without freezing the event loop.
         access_token_obj = await asyncio.to_thread(
             self.credentials.get_token, "https://cognitiveservices.azure.com/.default"
         )
-        return access_token_obj.token
+        return access_token_obj
+
+    async def _refresh_token(self) -> AccessToken:
+        async with self._token_lock:
+            # Another caller may have refreshed it while we waited for the lock.
+            if self._token is None or self._token.expires_on - time.time() <= self.token_refresh_margin:
+                self._token = await self._fetch_token()
+                logger.info("Azure AD token refreshed.")
+            return self._token
+
+    async def _get_token(self) -> str:
+        """
+        Returns a cached Azure AD token, fetching a new one only when the cached
+        token is within `token_refresh_margin` of expiry. A token nearing that
+        point is refreshed in the background so callers rarely wait for the
+        credential chain.
+        """
+        if self.key is not None:
+            raise TypeError("Token-based authentication is not used with an API key.")
+
+        token = self._token
+        remaining = token.expires_on - time.time() if token is not None else 0
+        if remaining > self.token_refresh_margin:
+            if remaining < 2 * self.token_refresh_margin and (self._token_refresh is None or self._token_refresh.done()):
+                self._token_refresh = asyncio.create_task(self._refresh_token_early())
+            return token.token
+        return (await self._refresh_token()).token
+
+    async def _refresh_token_early(self) -> None:
+        try:
+            async with self._token_lock:
+                self._token = await self._fetch_token()
+        except Exception as e:
+            logger.warning(f"Background token refresh failed: {e}")
+
+    async def _auth_headers(self) -> dict:
+        if self.key is not None:
+            return { "api-key": self.key }
+        return { "Authorization": f"Bearer {await self._get_token()}" }
 
-    async def _process_message_to_client(self, msg: str, client_ws: web.WebSocketResponse, server_ws: web.WebSocketResponse) -> Optional[str]:
-        message = json.loads(msg.data)
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """The shared client session used for every upstream connection."""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                base_url=self.endpoint,
+                connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+            )
+        return self._http_session
+
+    async def _connect_upstream(self, extra_headers: Optional[dict] = None) -> aiohttp.ClientWebSocketResponse:
+        params = { "api-version": self.api_version, "deployment": self.deployment}
+        headers = await self._auth_headers()
+        if extra_headers:
+            headers.update(extra_headers)
+        return await self._get_http_session().ws_connect("/openai/realtime", headers=headers, params=params, heartbeat=30)
+
+    async def _open_pooled_upstream(self) -> Tuple[aiohttp.ClientWebSocketResponse, List[aiohttp.WSMessage]]:
+        """
+        Opens an upstream socket for the pool and applies the server-enforced
+        session config ahead of time. The `session.created` event is kept so it
+        can be replayed to the caller that eventually receives the socket.
+        """
+        target_ws = await self._connect_upstream()
+        try:
+            created = await target_ws.receive(timeout=10)
+            session: dict = {}
+            self._apply_session_config(session)
+            await target_ws.send_str(json_dumps({"type": "session.update", "session": session}))
+            # Drain the acknowledgement so the caller starts from a clean stream.
+            while True:
+                msg = await target_ws.receive(timeout=10)
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    raise ConnectionError(f"Upstream closed while pre-configuring ({msg.type}).")
+                if peek_event_type(msg.data) in ("session.updated", "error"):
+                    break
+            return target_ws, [created] if created.type == aiohttp.WSMsgType.TEXT else []
+        except BaseException:
+            await target_ws.close()
+            raise
+
+    async def warm_up(self) -> None:
+        """Prefetches the Azure AD token so the first caller doesn't wait for the credential chain."""
+        self._get_http_session()
+        if self.key is None:
+            await self._get_token()
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._get_http_session()
+        if self.upstream_pool_size > 0:
+            self._upstream_pool = UpstreamPool(self._open_pooled_upstream, self.upstream_pool_size, self.upstream_pool_max_age)
+            self._upstream_pool.start()
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        if self._upstream_pool is not None:
+            await self._upstream_pool.close()
+        if self._token_refresh is not None:
+            self._token_refresh.cancel()
+        if self._http_session is not None:
+            await self._http_session.close()
+
+    async def _run_tool(self, name: str, args: dict, speculative: Optional[asyncio.Task] = None) -> ToolResult:
+        """Runs a tool, preferring a matching speculative result when one was handed over."""
+        started = time.perf_counter()
+        try:
+            return await self._run_tool_once(name, args, speculative)
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - started, name)
+
+    async def _run_tool_once(self, name: str, args: dict, speculative: Optional[asyncio.Task]) -> ToolResult:
+        if speculative is not None:
+            try:
+                result = await speculative
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.warning(f"Speculative tool call failed, running it again: {e}")
+        try:
+            return await self.tools[name].target(args)
+        except Exception as e:
+            logger.error(f"Tool '{name}' failed: {e}", exc_info=True)
+            return ToolResult("The tool failed to run.", ToolResultDirection.TO_SERVER)
+
+    def _audio_frame(self, data: str) -> Optional[bytes]:
+        """Turns an audio delta event into a binary frame; None if it can't be."""
+        message = json_loads(data)
+        try:
+            pcm = base64.b64decode(message["delta"])
+            return encode_audio_frame(str(message.get("item_id", "")), int(message.get("content_index", 0)), pcm)
+        except (KeyError, TypeError, ValueError, binascii.Error):
+            return None
+
+    async def _process_message_to_client(self, msg: str, session: RTSession) -> Optional[Union[str, bytes]]:
+        # Fast path: audio deltas and other pass-through events are never decoded
+        # (unless the client asked for binary audio, in which case each delta is decoded once here).
+        event_type = peek_event_type(msg.data)
+        if event_type is not None and event_type not in _SERVER_EVENTS_TO_PROCESS:
+            if event_type in _AUDIO_DELTA_EVENTS:
+                session.metrics.audio_delta()
+                if session.binary_audio:
+                    return self._audio_frame(msg.data) or msg.data
+            elif event_type == _SPEECH_STOPPED_EVENT:
+                session.metrics.speech_stopped()
+            return msg.data
+        client_ws, server_ws = session.client_ws, session.server_ws
+        tool_runner, speculation = session.tool_runner, session.speculation
+        message = json_loads(msg.data)
         updated_message = msg.data
         if message is not None:
             match message["type"]:
                 case "session.created":
-                    session = message["session"]
-                    session["instructions"] = ""
-                    session["tools"] = []
-                    session["voice"] = self.voice_choice
-                    session["tool_choice"] = "none"
-                    session["max_response_output_tokens"] = None
-                    updated_message = json.dumps(message)
+                    session_config = message["session"]
+                    session_config["instructions"] = ""
+                    session_config["tools"] = []
+                    session_config["voice"] = self.voice_choice
+                    session_config["tool_choice"] = "none"
+                    session_config["max_response_output_tokens"] = None
+                    updated_message = json_dumps(message)
+
+                case "conversation.item.input_audio_transcription.completed":
+                    # The user's turn is final: start the likely search now.
+                    transcript = (message.get("transcript") or "").strip()
+                    if speculation is not None and transcript:
+                        speculation.start(transcript)
+
+                case "input_audio_buffer.speech_started":
+                    # Barge-in or a new turn: running tools and any earlier speculation are stale.
+                    if tool_runner.pending:
+                        logger.info(f"Barge-in: cancelling {tool_runner.pending} running tool call(s).")
+                        tool_runner.cancel_all()
+                        session.tools_pending.clear()
+                    if speculation is not None:
+                        speculation.cancel()
 
                 case "response.output_item.added":
                     if "item" in message and message["item"]["type"] == "function_call":
@@ -110,8 +760,8 @@ class RTMiddleTier:
                 case "conversation.item.created":
                     if "item" in message and message["item"]["type"] == "function_call":
                         item = message["item"]
-                        if item["call_id"] not in self._tools_pending:
-                            self._tools_pending[item["call_id"]] = RTToolCall(item["call_id"], message["previous_item_id"])
+                        if item["call_id"] not in session.tools_pending:
+                            session.tools_pending[item["call_id"]] = RTToolCall(item["call_id"], message["previous_item_id"])
                         updated_message = None
                     elif "item" in message and message["item"]["type"] == "function_call_output":
                         updated_message = None
@@ -125,33 +775,51 @@ class RTMiddleTier:
                 case "response.output_item.done":
                     if "item" in message and message["item"]["type"] == "function_call":
                         item = message["item"]
-                        tool_call = self._tools_pending[message["item"]["call_id"]]
-                        tool = self.tools[item["name"]]
-                        args = item["arguments"]
-                        result = await tool.target(json.loads(args))
-                        await server_ws.send_json({
-                            "type": "conversation.item.create",
-                            "item": {
-                                "type": "function_call_output",
-                                "call_id": item["call_id"],
-                                "output": result.to_text() if result.destination == ToolResultDirection.TO_SERVER else ""
-                            }
-                        })
-                        if result.destination == ToolResultDirection.TO_CLIENT:
-                            await client_ws.send_json({
-                                "type": "extension.middle_tier_tool_response",
-                                "previous_item_id": tool_call.previous_id,
-                                "tool_name": item["name"],
-                                "tool_result": result.to_text()
-                            })
+                        tool_call = session.tools_pending.get(item["call_id"])
+                        if tool_call is None:
+                            # Dropped by a barge-in or cancel before the call finished streaming.
+                            logger.info(f"Skipping tool call {item['call_id']}: no longer pending.")
+                        else:
+                            args = json_loads(item["arguments"])
+                            speculative = None
+                            if speculation is not None and item["name"] == self.speculative_tool:
+                                speculative = speculation.take(args)
+
+                            async def deliver(result: ToolResult, item=item, tool_call=tool_call):
+                                await server_ws.send_json({
+                                    "type": "conversation.item.create",
+                                    "item": {
+                                        "type": "function_call_output",
+                                        "call_id": item["call_id"],
+                                        "output": result.to_text() if result.destination == ToolResultDirection.TO_SERVER else ""
+                                    }
+                                }, dumps=json_dumps)
+                                if result.destination == ToolResultDirection.TO_CLIENT:
+                                    await client_ws.send_json({
+                                        "type": "extension.middle_tier_tool_response",
+                                        "previous_item_id": tool_call.previous_id,
+                                        "tool_name": item["name"],
+                                        "tool_result": result.to_text()
+                                    }, dumps=json_dumps)
+
+                            # Run off the forwarding loop; outputs are still delivered in call order.
+                            tool_runner.submit(lambda name=item["name"]: self._run_tool(name, args, speculative), deliver)
                         updated_message = None
 
                 case "response.done":
-                    if len(self._tools_pending) > 0:
-                        self._tools_pending.clear()
-                        await server_ws.send_json({
-                            "type": "response.create"
-                        })
+                    # The model answered without using the speculation.
+                    if speculation is not None:
+                        speculation.cancel()
+                    if len(session.tools_pending) > 0:
+                        session.tools_pending.clear()
+
+                        async def request_response():
+                            await server_ws.send_json({
+                                "type": "response.create"
+                            }, dumps=json_dumps)
+
+                        # Ask for the follow-up response only once every tool output is in.
+                        tool_runner.after_all(request_response)
                     if "response" in message:
                         replace = False
                         for i, output in enumerate(reversed(message["response"]["output"])):
@@ -159,85 +827,157 @@ class RTMiddleTier:
                                 message["response"]["output"].pop(i)
                                 replace = True
                         if replace:
-                            updated_message = json.dumps(message)                        
+                            updated_message = json_dumps(message)                        
 
         return updated_message
 
-    async def _process_message_to_server(self, msg: str, ws: web.WebSocketResponse) -> Optional[str]:
-        message = json.loads(msg.data)
+    def _apply_session_config(self, session: dict) -> None:
+        """Overwrites a session config with the server-enforced settings and tools."""
+        if self.system_message is not None:
+            session["instructions"] = self.system_message
+        if self.temperature is not None:
+            session["temperature"] = self.temperature
+        if self.max_tokens is not None:
+            session["max_response_output_tokens"] = self.max_tokens
+        if self.disable_audio is not None:
+            session["disable_audio"] = self.disable_audio
+        if self.voice_choice is not None:
+            session["voice"] = self.voice_choice
+        if self.speculative_tool is not None and not session.get("input_audio_transcription"):
+            # Speculation is driven by the user's transcript.
+            session["input_audio_transcription"] = {"model": "whisper-1"}
+        if self.turn_detection_config is not None:
+            session["turn_detection"] = self.turn_detection_config
+        session["tool_choice"] = "auto" if len(self.tools) > 0 else "none"
+        session["tools"] = self.tool_schemas
+
+    async def _process_message_to_server(self, msg: str, session: RTSession) -> Optional[str]:
+        # Fast path: input_audio_buffer.append and friends are forwarded untouched.
+        event_type = peek_event_type(msg.data, strict=True)
+        if event_type is not None and event_type not in _CLIENT_EVENTS_TO_PROCESS:
+            return msg.data
+        message = json_loads(msg.data)
         updated_message = msg.data
         if message is not None:
             match message["type"]:
                 case "session.update":
-                    session = message["session"]
-                    if self.system_message is not None:
-                        session["instructions"] = self.system_message
-                    if self.temperature is not None:
-                        session["temperature"] = self.temperature
-                    if self.max_tokens is not None:
-                        session["max_response_output_tokens"] = self.max_tokens
-                    if self.disable_audio is not None:
-                        session["disable_audio"] = self.disable_audio
-                    if self.voice_choice is not None:
-                        session["voice"] = self.voice_choice
+                    session_config = message["session"]
+                    self._apply_session_config(session_config)
                     if self.turn_detection_config is not None:
-                        session["turn_detection"] = self.turn_detection_config
                         logger.info(f"Applying custom turn detection settings: {self.turn_detection_config}")   
-                    session["tool_choice"] = "auto" if len(self.tools) > 0 else "none"
-                    session["tools"] = self.tool_schemas
-                    print("DEBUG: Final tool structure being sent to Azure:", json.dumps(session["tools"], indent=2))
+                    logger.debug("Final tool structure being sent to Azure: %s", session_config["tools"])
 
-                    updated_message = json.dumps(message)
+                    updated_message = json_dumps(message)
 
         return updated_message
 
     async def _forward_messages(self, ws: web.WebSocketResponse):
-        async with aiohttp.ClientSession(base_url=self.endpoint) as session:
-            params = { "api-version": self.api_version, "deployment": self.deployment}
-            headers = {}
-            if "x-ms-client-request-id" in ws.headers:
-                headers["x-ms-client-request-id"] = ws.headers["x-ms-client-request-id"]
-            if self.key is not None:
-                headers = { "api-key": self.key }
+        speculation = None
+        if self.speculative_tool is not None and self.speculative_tool in self.tools:
+            speculation = SpeculativeToolCall(self.tools[self.speculative_tool], self.speculative_arg, self.speculation_min_similarity)
+        session = RTSession(ws, speculation)
+        self.sessions.add(session)
+        try:
+            await self._relay(session)
+        finally:
+            self.sessions.remove(session)
+            session.close()
+
+    async def _relay(self, session: RTSession):
+        ws = session.client_ws
+        connect_started = time.monotonic()
+        client_request_id = ws.headers.get("x-ms-client-request-id")
+        # A pooled socket was opened before this caller arrived, so it cannot carry
+        # the caller's correlation ID; such calls connect directly instead.
+        pooled = self._upstream_pool.acquire() if self._upstream_pool is not None and client_request_id is None else None
+        if pooled is not None:
+            target_ws, replay = pooled
+        else:
+            extra_headers = {}
+            if client_request_id is not None:
+                extra_headers["x-ms-client-request-id"] = client_request_id
+            target_ws, replay = await self._connect_upstream(extra_headers), []
+        session.server_ws = target_ws
+        session.metrics.upstream_connected(time.monotonic() - connect_started, pooled is not None)
+
+        async def send_to_server(data: str) -> None:
+            await target_ws.send_str(data)
+            session.metrics.messages_in += 1
+            session.metrics.bytes_in += len(data)
+
+        coalescer = None
+        if self.audio_coalesce_window > 0:
+            coalescer = AudioAppendCoalescer(send_to_server, self.audio_coalesce_window, self.audio_coalesce_max_bytes, session.metrics)
+
+        async def from_client_to_server():
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    if peek_event_type(msg.data, strict=True) == _AUDIO_APPEND_EVENT:
+                        if coalescer is not None and await coalescer.append(msg.data):
+                            continue
+                        session.metrics.appends_received += 1
+                        session.metrics.appends_sent += 1
+                    if coalescer is not None:
+                        # Commits, clears and every other event go after the audio before them.
+                        await coalescer.flush()
+                    new_msg = await self._process_message_to_server(msg, session)
+                    if new_msg is not None:
+                        await send_to_server(new_msg)
+                else:
+                    print("Error: unexpected message type:", msg.type)
+
+            if coalescer is not None:
+                await coalescer.flush()
+            if target_ws:
+                print("Closing OpenAI's realtime socket connection.")
+                await target_ws.close()
+                
+        async def send_to_client(data: Union[str, bytes]) -> None:
+            if isinstance(data, bytes):
+                await ws.send_bytes(data)
             else:
-                logger.info("Acquiring token for WebSocket connection...")
-                token = await self._get_token()
-                headers = { "Authorization": f"Bearer {token}" }
-                logger.info("Token acquired successfully.")
-
-            async with session.ws_connect("/openai/realtime", headers=headers, params=params) as target_ws:
-                async def from_client_to_server():
-                    async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            new_msg = await self._process_message_to_server(msg, ws)
-                            if new_msg is not None:
-                                await target_ws.send_str(new_msg)
-                        else:
-                            print("Error: unexpected message type:", msg.type)
-                    
-                    if target_ws:
-                        print("Closing OpenAI's realtime socket connection.")
-                        await target_ws.close()
-                        
-                async def from_server_to_client():
-                    async for msg in target_ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            new_msg = await self._process_message_to_client(msg, ws, target_ws)
-                            if new_msg is not None:
-                                await ws.send_str(new_msg)
-                        else:
-                            print("Error: unexpected message type:", msg.type)
+                await ws.send_str(data)
+            session.metrics.messages_out += 1
+            session.metrics.bytes_out += len(data)
 
-                try:
-                    await asyncio.gather(from_client_to_server(), from_server_to_client())
-                except ConnectionResetError:
-                    pass
+        async def from_server_to_client():
+            # Events a pooled socket received before it was handed to this caller.
+            for msg in replay:
+                new_msg = await self._process_message_to_client(msg, session)
+                if new_msg is not None:
+                    await send_to_client(new_msg)
+            async for msg in target_ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    new_msg = await self._process_message_to_client(msg, session)
+                    if new_msg is not None:
+                        await send_to_client(new_msg)
+                else:
+                    print("Error: unexpected message type:", msg.type)
+
+        try:
+            await asyncio.gather(from_client_to_server(), from_server_to_client())
+        except ConnectionResetError:
+            pass
+        finally:
+            if coalescer is not None:
+                coalescer.close()
+            await target_ws.close()
 
     async def _websocket_handler(self, request: web.Request):
-        ws = web.WebSocketResponse()
-        await ws.prepare(request)
-        await self._forward_messages(ws)
-        return ws
+        # Admission happens before the upgrade so a rejected caller gets a plain 503.
+        if not await self.sessions.acquire():
+            logger.warning(f"Rejecting call: {len(self.sessions)} active session(s) at the configured limit.")
+            return web.Response(status=503, text="Too many concurrent calls, please try again shortly.", headers={"Retry-After": "5"})
+        try:
+            # Clients that don't offer the subprotocol get the plain JSON relay.
+            ws = web.WebSocketResponse(protocols=(BINARY_AUDIO_PROTOCOL,))
+            await ws.prepare(request)
+            await self._forward_messages(ws)
+            return ws
+        finally:
+            self.sessions.release()
     
     def attach_to_app(self, app, path):
-        app.router.add_get(path, self._websocket_handler)
\ No newline at end of file
+        app.router.add_get(path, self._websocket_handler)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
\ No newline at end of file
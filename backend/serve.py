@@ -0,0 +1,316 @@
+"""
+Multi-process serving: a supervisor that runs N app workers on one port.
+
+    python serve.py --workers 4
+
+Workers bind APP_HOST:APP_PORT with SO_REUSEPORT, so the kernel spreads
+incoming calls across them. They share one read-only index: a Qdrant server
+when QDRANT_URL is set, otherwise a memory-mapped snapshot of the embedded
+collection that the supervisor exports. The supervisor checks the snapshot
+every few seconds and, once ingest.py has changed the collection, exports a
+fresh one and rolls the workers onto it.
+
+Signals: SIGHUP performs a rolling restart (refreshing the snapshot first),
+SIGTERM/SIGINT drain and stop all workers. Crashed workers are restarted.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger("voicerag.serve")
+
+# A worker that exits sooner than this after starting counts as a failed start.
+_MIN_HEALTHY_SECONDS = 10.0
+# How often the supervisor checks whether ingest.py has outdated the snapshot.
+_SNAPSHOT_CHECK_SECONDS = 5.0
+
+
+# ==============================================================================
+# 1. Shared Index
+# ==============================================================================
+
+def prepare_shared_index(force: bool = False) -> Dict[str, str]:
+    """
+    Makes sure every worker can open the index and returns the environment
+    the workers need for it. Against a Qdrant server nothing is exported;
+    otherwise the embedded collection is exported to a read-only snapshot
+    whenever ingest.py has updated it since the last export.
+    """
+    if settings.QDRANT_URL:
+        logger.info(f"Workers will share the Qdrant server at {settings.QDRANT_URL}.")
+        return {}
+
+    from qdrant_client import QdrantClient
+
+    from vector_snapshot import export_snapshot, snapshot_is_current
+
+    root = Path(settings.QDRANT_PATH)
+    source_mtime = _manifest_mtime(root)
+    if force or not snapshot_is_current(root, source_mtime):
+        logger.info("Exporting a read-only snapshot of the embedded collection for the workers...")
+        # The embedded store is locked while open, so it is closed again before workers start.
+        client = QdrantClient(path=str(root))
+        try:
+            export_snapshot(client, settings.QDRANT_COLLECTION_NAME, root, source_mtime=source_mtime)
+        finally:
+            client.close()
+    else:
+        logger.info("Read-only snapshot is up to date.")
+    return {"QDRANT_READ_ONLY_SNAPSHOT": "true"}
+
+
+def shared_index_is_stale() -> bool:
+    """True if ingest.py has changed the embedded collection since the snapshot was exported."""
+    if settings.QDRANT_URL:
+        return False
+    from vector_snapshot import snapshot_is_current
+
+    root = Path(settings.QDRANT_PATH)
+    return not snapshot_is_current(root, _manifest_mtime(root))
+
+
+def _manifest_mtime(root: Path) -> float:
+    # ingest.py rewrites its manifest on every run that changes the collection.
+    manifest = root / "processed_files.json"
+    return manifest.stat().st_mtime if manifest.exists() else 0.0
+
+
+# ==============================================================================
+# 2. Worker Process
+# ==============================================================================
+
+def _run_worker(worker_id: int, host: str, port: int, ready) -> None:
+    """Worker entry point: the regular app, bound with SO_REUSEPORT."""
+    from aiohttp import web
+
+    import app as voicerag_app
+    from config import settings as worker_settings
+
+    async def _create():
+        application = await voicerag_app.create_app()
+        readiness = application[voicerag_app.READINESS]
+
+        async def _wait_for_warm_up(_app):
+            # Startup hooks run before the worker listens. Unlike a single server, a
+            # worker must not listen while cold: SO_REUSEPORT would route calls to it.
+            if not await readiness.wait():
+                raise RuntimeError(f"Worker {worker_id} failed to warm up: {readiness.error}")
+            ready.set()
+        application.on_startup.append(_wait_for_warm_up)
+        return application
+
+    logging.getLogger("voicerag").info(f"Worker {worker_id} (pid {os.getpid()}) starting.")
+    web.run_app(
+        _create(),
+        host=host,
+        port=port,
+        reuse_port=True,
+        shutdown_timeout=worker_settings.WORKER_SHUTDOWN_TIMEOUT_SECONDS,
+        print=None,
+    )
+
+
+class Worker:
+    def __init__(self, worker_id: int, process: multiprocessing.Process, ready):
+        self.worker_id = worker_id
+        self.process = process
+        self.ready = ready
+        self.started_at = time.monotonic()
+
+
+# ==============================================================================
+# 3. Supervisor
+# ==============================================================================
+
+class Supervisor:
+    """
+    Starts and watches the worker processes. Restarts are rolling: a
+    replacement worker is started and must report ready before the old one
+    is asked to stop, so the port keeps accepting calls throughout, and a
+    stopping worker lets in-flight calls finish for up to
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self, workers: int, host: str, port: int, startup_timeout: float = 120.0):
+        self.count = workers
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.workers: List[Optional[Worker]] = [None] * workers
+        self.env: Dict[str, str] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+        self._reload_requested = False
+        # Per worker slot: quick consecutive crashes, and when a crashed worker is due back.
+        self._failures: List[int] = [0] * workers
+        self._restart_at: List[Optional[float]] = [None] * workers
+        self._next_snapshot_check = time.monotonic() + _SNAPSHOT_CHECK_SECONDS
+
+    def _spawn(self, worker_id: int) -> Worker:
+        ready = self._context.Event()
+        # Spawned workers inherit the environment (and so read these settings) at start.
+        os.environ.update(self.env)
+        process = self._context.Process(
+            target=_run_worker,
+            args=(worker_id, self.host, self.port, ready),
+            name=f"voicerag-worker-{worker_id}",
+        )
+        process.start()
+        return Worker(worker_id, process, ready)
+
+    def _wait_ready(self, worker: Worker) -> bool:
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if worker.ready.wait(timeout=0.5):
+                return True
+            if not worker.process.is_alive() or self._stopping:
+                return False
+        return False
+
+    def _stop(self, worker: Worker, timeout: float) -> None:
+        if worker.process.is_alive():
+            # aiohttp handles SIGTERM as a graceful shutdown.
+            worker.process.terminate()
+        worker.process.join(timeout)
+        if worker.process.is_alive():
+            logger.warning(f"Worker {worker.worker_id} did not stop in {timeout:.0f}s; killing it.")
+            worker.process.kill()
+            worker.process.join()
+
+    def _drain_timeout(self) -> float:
+        return settings.WORKER_SHUTDOWN_TIMEOUT_SECONDS + 10
+
+    def start(self) -> None:
+        self.env = prepare_shared_index()
+        for worker_id in range(self.count):
+            worker = self._spawn(worker_id)
+            self.workers[worker_id] = worker
+            if not self._wait_ready(worker):
+                raise RuntimeError(f"Worker {worker_id} failed to start (exit code {worker.process.exitcode}).")
+        logger.info(f"{self.count} worker(s) serving on http://{self.host}:{self.port}")
+
+    def rolling_restart(self, refresh_index: bool = True) -> None:
+        logger.info("Rolling restart requested.")
+        if refresh_index:
+            try:
+                self.env = prepare_shared_index()
+            except Exception as e:
+                logger.error(f"Could not refresh the shared index; restarting on the current one: {e}")
+        for worker_id, old in enumerate(self.workers):
+            if self._stopping:
+                return
+            replacement = self._spawn(worker_id)
+            if not self._wait_ready(replacement):
+                logger.error(f"Replacement for worker {worker_id} failed to start; keeping the old worker.")
+                self._stop(replacement, timeout=5)
+                continue
+            self.workers[worker_id] = replacement
+            self._restart_at[worker_id] = None
+            if old is not None:
+                self._stop(old, self._drain_timeout())
+            logger.info(f"Worker {worker_id} restarted (pid {replacement.process.pid}).")
+        logger.info("Rolling restart complete.")
+
+    def _refresh_stale_snapshot(self) -> None:
+        """
+        Re-exports the snapshot and rolls the workers onto it once ingest.py
+        has changed the collection. Workers in snapshot mode do not reload
+        anything themselves, so their dense and lexical indexes stay in step.
+        """
+        now = time.monotonic()
+        if settings.QDRANT_URL or now < self._next_snapshot_check:
+            return
+        self._next_snapshot_check = now + _SNAPSHOT_CHECK_SECONDS
+        if not shared_index_is_stale():
+            return
+        logger.info("The collection has changed since the snapshot was exported; refreshing it.")
+        try:
+            self.env = prepare_shared_index()
+        except Exception as e:
+            # e.g. ingest.py still holds the embedded store's lock; try again next check.
+            logger.warning(f"Could not export a fresh snapshot yet: {e}")
+            return
+        self.rolling_restart(refresh_index=False)
+
+    def _check_workers(self) -> None:
+        # Restarts are scheduled, not slept on, so one crash-looping worker
+        # neither delays the others nor blocks reloads and shutdown.
+        now = time.monotonic()
+        for worker_id, worker in enumerate(self.workers):
+            restart_at = self._restart_at[worker_id]
+            if restart_at is not None:
+                if now >= restart_at and not self._stopping:
+                    self._restart_at[worker_id] = None
+                    self.workers[worker_id] = self._spawn(worker_id)
+                    logger.info(f"Worker {worker_id} respawned (pid {self.workers[worker_id].process.pid}).")
+                continue
+            if worker is None or worker.process.is_alive():
+                continue
+            uptime = now - worker.started_at
+            failures = self._failures[worker_id] + 1 if uptime < _MIN_HEALTHY_SECONDS else 0
+            self._failures[worker_id] = failures
+            delay = min(30.0, 2.0 ** failures) if failures else 0.0
+            logger.warning(f"Worker {worker_id} exited with code {worker.process.exitcode}; restarting in {delay:.0f}s.")
+            self._restart_at[worker_id] = now + delay
+
+    def stop(self) -> None:
+        self._stopping = True
+        logger.info("Stopping workers...")
+        for worker in self.workers:
+            if worker is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker is not None:
+                self._stop(worker, self._drain_timeout())
+        logger.info("All workers stopped.")
+
+    def run(self) -> None:
+        def _request_stop(signum, frame):
+            self._stopping = True
+
+        def _request_reload(signum, frame):
+            self._reload_requested = True
+
+        signal.signal(signal.SIGTERM, _request_stop)
+        signal.signal(signal.SIGINT, _request_stop)
+        signal.signal(signal.SIGHUP, _request_reload)
+
+        try:
+            self.start()
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.rolling_restart()
+                self._refresh_stale_snapshot()
+                self._check_workers()
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the app as N worker processes sharing one port.")
+    parser.add_argument("--workers", type=int, default=settings.WORKERS, help="Worker processes (0 = one per CPU core).")
+    parser.add_argument("--host", default=settings.APP_HOST)
+    parser.add_argument("--port", type=int, default=settings.APP_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - [supervisor] %(message)s")
+    if not hasattr(socket, "SO_REUSEPORT") or sys.platform == "win32":
+        sys.exit("Multi-worker mode needs SO_REUSEPORT (Linux/macOS); run 'python app.py' instead.")
+
+    workers = args.workers or os.cpu_count() or 1
+    Supervisor(workers, args.host, args.port).run()
+
+
+if __name__ == "__main__":
+    main()
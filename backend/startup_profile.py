@@ -0,0 +1,94 @@
+"""
+Import-time profile of the app.
+
+Imports a module (the app by default) in a fresh interpreter under
+`python -X importtime` and reports the slowest imports and the total per
+top-level package, so a heavy import creeping back onto the startup path
+shows up before it reaches production:
+
+    python startup_profile.py --top 15
+    python startup_profile.py --budget-ms 1500   # exit status 1 when over budget
+
+Heavy libraries (LangChain's Qdrant and OpenAI integrations, qdrant_client,
+azure.identity) are meant to load during the warm-up after the server
+listens, not here.
+"""
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> List[ImportTiming]:
+    """Parses the `import time: self [us] | cumulative | imported package` lines."""
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The header line.
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        # Nested imports are indented by two spaces per level.
+        depth = (len(name) - len(module) - 1) // 2
+        timings.append(ImportTiming(module, depth, int(fields[0]), int(fields[1])))
+    return timings
+
+
+def profile_import(module: str) -> List[ImportTiming]:
+    # Run from the backend directory so the app reads its .env as usual.
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        tail = "\n".join(line for line in completed.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"Importing {module} failed:\n{tail}")
+    return parse_importtime(completed.stderr)
+
+
+def print_report(module: str, timings: List[ImportTiming], top: int) -> float:
+    total_ms = sum(t.self_us for t in timings) / 1000
+    by_package: Dict[str, int] = defaultdict(int)
+    for t in timings:
+        by_package[t.module.split(".")[0]] += t.self_us
+
+    print(f"Importing {module}: {total_ms:.0f}ms across {len(timings)} modules")
+    print("\nSlowest imports (cumulative):")
+    for t in sorted(timings, key=lambda t: -t.cumulative_us)[:top]:
+        print(f"  {t.cumulative_us / 1000:9.1f}ms  {t.module}")
+    print("\nBy top-level package (self time):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {self_us / 1000:9.1f}ms  {package}")
+    return total_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time profile of the app.")
+    parser.add_argument("--module", default="app", help="Module to import (from the backend directory).")
+    parser.add_argument("--top", type=int, default=20, help="How many imports and packages to list.")
+    parser.add_argument("--budget-ms", type=float, help="Exit with status 1 if the import takes longer than this.")
+    args = parser.parse_args()
+
+    total_ms = print_report(args.module, profile_import(args.module), args.top)
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nOver budget: {total_ms:.0f}ms > {args.budget_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+from embedding_disk_cache import DiskEmbeddingCache
+from embedding_scheduler import EmbeddingScheduler
+
+DIMENSIONS = 8
+
+
+class FakeEmbeddingsClient:
+    """Stands in for AsyncAzureOpenAI, counting the texts sent for embedding."""
+
+    def __init__(self):
+        self.embedded_texts = 0
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    async def _create(self, model, input):
+        self.embedded_texts += len(input)
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))] * DIMENSIONS) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data)
+
+
+def _build(cache_root, texts):
+    client = FakeEmbeddingsClient()
+    scheduler = EmbeddingScheduler(client, deployment="test", cache=DiskEmbeddingCache(cache_root, "test", DIMENSIONS))
+    vectors = asyncio.run(scheduler.embed(texts))
+    return client, vectors
+
+
+def test_rebuild_reuses_disk_cache(tmp_path):
+    texts = [f"chunk number {i}" for i in range(11)]
+
+    first, first_vectors = _build(tmp_path, texts)
+    assert first.embedded_texts == len(texts)
+
+    # A rebuild opens the cache afresh, as a new ingest.py run would.
+    second, second_vectors = _build(tmp_path, texts)
+    assert second.embedded_texts == 0
+    assert second_vectors == first_vectors
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+# Not `models.QueryResponse`: that name is fastembed's query result, not the search response.
+from qdrant_client.http.models import QueryResponse
+
+from chunk_store import ChunkStore, write_chunk_store
+
+logger = logging.getLogger("voicerag.vector_snapshot")
+
+# <QDRANT_PATH>/snapshot.json points at the current snapshot-<timestamp>/ directory,
+# which holds vectors.f32 (N x D float32, unit length), chunks.bin (chunk store
+# format) and metadata.json (point ids, in vector order, and their metadata).
+POINTER_FILENAME = "snapshot.json"
+VECTORS_FILENAME = "vectors.f32"
+CHUNKS_FILENAME = "chunks.bin"
+METADATA_FILENAME = "metadata.json"
+
+
+# ==============================================================================
+# Export
+# ==============================================================================
+
+def snapshot_is_current(root: Path, source_mtime: float) -> bool:
+    """True if the snapshot under `root` was exported from data no older than `source_mtime`."""
+    pointer = Path(root) / POINTER_FILENAME
+    if not pointer.exists():
+        return False
+    try:
+        info = json.loads(pointer.read_text(encoding="utf-8"))
+    except Exception:
+        return False
+    return info.get("source_mtime", 0) >= source_mtime and (Path(root) / info["directory"]).exists()
+
+
+def export_snapshot(client: QdrantClient, collection_name: str, root: Path, source_mtime: float = 0.0, batch_size: int = 256) -> Path:
+    """
+    Writes a read-only snapshot of a collection under `root` and makes it the
+    current one. Snapshots are written to a fresh directory and published by
+    atomically replacing the pointer file, so running workers keep their
+    mapped files while new workers pick up the new snapshot; older snapshot
+    directories are then removed (open mappings stay valid on POSIX).
+    """
+    root = Path(root)
+    directory = root / f"snapshot-{time.time_ns()}"
+    directory.mkdir(parents=True)
+
+    ids: List[str] = []
+    metadata: List[Dict[str, Any]] = []
+    records = []
+    vectors = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        for point in points:
+            payload = point.payload or {}
+            meta = payload.get("metadata") or {}
+            ids.append(str(point.id))
+            metadata.append(meta)
+            records.append((str(point.id), str(meta.get("source", "Unknown Source")), payload.get("page_content", "")))
+            vectors.append(point.vector)
+        if offset is None:
+            break
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    matrix.tofile(directory / VECTORS_FILENAME)
+    write_chunk_store(directory / CHUNKS_FILENAME, records)
+    with open(directory / METADATA_FILENAME, "w", encoding="utf-8") as f:
+        json.dump({"collection": collection_name, "dimensions": matrix.shape[1], "ids": ids, "metadata": metadata}, f)
+
+    pointer = root / POINTER_FILENAME
+    tmp_pointer = pointer.with_suffix(".tmp")
+    tmp_pointer.write_text(json.dumps({"directory": directory.name, "source_mtime": source_mtime, "count": len(ids)}), encoding="utf-8")
+    os.replace(tmp_pointer, pointer)
+
+    for old in root.glob("snapshot-*"):
+        if old != directory and old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+    logger.info(f"Exported snapshot of '{collection_name}' with {len(ids)} points to '{directory}'.")
+    return directory
+
+
+# ==============================================================================
+# Read-only Access
+# ==============================================================================
+
+class VectorSnapshot:
+    """
+    Read-only, memory-mapped copy of a collection that many worker processes
+    can open at once (unlike the embedded Qdrant, which locks its directory).
+    Vectors and chunk texts are mapped from the page cache, so N workers
+    share one copy in RAM.
+
+    It answers the subset of the QdrantClient API that QdrantAccess uses
+    (`query_points`, `retrieve`), so it can be passed in place of a client.
+    Search is exact cosine similarity over all vectors, which is what the
+    embedded Qdrant does as well.
+    """
+
+    def __init__(self, root: Path):
+        root = Path(root)
+        info = json.loads((root / POINTER_FILENAME).read_text(encoding="utf-8"))
+        self.directory = root / info["directory"]
+        with open(self.directory / METADATA_FILENAME, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.collection_name: str = meta["collection"]
+        self.ids: List[str] = meta["ids"]
+        self.metadata: List[Dict[str, Any]] = meta["metadata"]
+        self._positions = {point_id: i for i, point_id in enumerate(self.ids)}
+        if self.ids:
+            self.vectors = np.memmap(self.directory / VECTORS_FILENAME, dtype=np.float32, mode="r", shape=(len(self.ids), meta["dimensions"]))
+        else:
+            self.vectors = np.zeros((0, meta["dimensions"]), dtype=np.float32)
+        self.chunks = ChunkStore(self.directory / CHUNKS_FILENAME)
+        logger.info(f"Opened read-only snapshot '{self.directory.name}' with {len(self.ids)} points.")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _payload(self, position: int) -> Dict[str, Any]:
+        entry = self.chunks.get(self.ids[position])
+        return {"page_content": entry[1] if entry else "", "metadata": self.metadata[position]}
+
+    def query_points(
+        self,
+        collection_name: str,
+        query: Sequence[float],
+        limit: int,
+        score_threshold: Optional[float] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        **kwargs,
+    ):
+        vector = np.asarray(query, dtype=np.float32)
+        vector /= (np.linalg.norm(vector) or 1.0)
+        scores = self.vectors @ vector
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return QueryResponse(points=[])
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        points = []
+        for position in top:
+            score = float(scores[position])
+            if score_threshold is not None and score < score_threshold:
+                break
+            points.append(models.ScoredPoint(
+                id=self.ids[position],
+                version=0,
+                score=score,
+                payload=self._payload(position) if with_payload else None,
+                vector=self.vectors[position].tolist() if with_vectors else None,
+            ))
+        return QueryResponse(points=points)
+
+    def retrieve(self, collection_name: str, ids: Sequence[str], with_payload: bool = True, **kwargs) -> list:
+        records = []
+        for point_id in ids:
+            position = self._positions.get(str(point_id))
+            if position is not None:
+                records.append(models.Record(id=self.ids[position], payload=self._payload(position) if with_payload else None))
+        return records
+
+    def close(self) -> None:
+        self.chunks.close()
+        self.vectors = None
@@ -26,7 +26,7 @@ function App() {
         onWebSocketError: event => console.error("WebSocket error:", event),
         onReceivedError: message => console.error("error", message),
         onReceivedResponseAudioDelta: message => {
-            isRecording && playAudio(message.delta);
+            isRecording && playAudio(message.pcm ?? message.delta);
         },
         onReceivedInputAudioBufferSpeechStarted: () => {
             stopAudioPlayer();
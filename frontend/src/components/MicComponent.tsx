@@ -50,7 +50,7 @@ export default function MicComponent({
     },
     onReceivedResponseAudioDelta: (message) => {
       if (isRecording) {
-        playAudio(message.delta);
+        playAudio(message.pcm ?? message.delta);
         setStatus("AI responding...");
       }
     },
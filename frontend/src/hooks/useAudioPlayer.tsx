@@ -12,8 +12,12 @@ export default function useAudioPlayer() {
         audioPlayer.current.init(SAMPLE_RATE);
     };
 
-    const play = (base64Audio: string) => {
-        const binary = atob(base64Audio);
+    const play = (audio: string | Int16Array) => {
+        if (typeof audio !== "string") {
+            audioPlayer.current?.play(audio);
+            return;
+        }
+        const binary = atob(audio);
         const bytes = Uint8Array.from(binary, c => c.charCodeAt(0));
         const pcmData = new Int16Array(bytes.buffer);
 
@@ -12,6 +12,29 @@ import {
     ResponseInputAudioTranscriptionCompleted
 } from "@/types";
 
+// Subprotocol the middle tier understands for binary response audio frames
+// (see BINARY_AUDIO_PROTOCOL in backend/rtmt.py for the frame layout).
+const BINARY_AUDIO_PROTOCOL = "voicerag.binary-audio.v1";
+const AUDIO_FRAME_DELTA = 1;
+
+const textDecoder = new TextDecoder();
+
+function decodeAudioFrame(frame: ArrayBuffer): ResponseAudioDelta | null {
+    const view = new DataView(frame);
+    if (frame.byteLength < 4 || view.getUint8(0) !== AUDIO_FRAME_DELTA) {
+        return null;
+    }
+    const idLength = view.getUint8(1);
+    const pcmOffset = 4 + idLength + (idLength % 2);
+    return {
+        type: "response.audio.delta",
+        delta: "",
+        content_index: view.getUint16(2, true),
+        item_id: textDecoder.decode(new Uint8Array(frame, 4, idLength)),
+        pcm: new Int16Array(frame, pcmOffset, (frame.byteLength - pcmOffset) >> 1)
+    };
+}
+
 type Parameters = {
     useDirectAoaiApi?: boolean; // If true, the middle tier will be skipped and the AOAI ws API will be called directly
     aoaiEndpointOverride?: string;
@@ -19,6 +42,8 @@ type Parameters = {
     aoaiModelOverride?: string;
 
     enableInputAudioTranscription?: boolean;
+    // Ask the middle tier for response audio as binary frames (on by default; ignored for the direct API).
+    binaryAudio?: boolean;
     onWebSocketOpen?: () => void;
     onWebSocketClose?: () => void;
     onWebSocketError?: (event: Event) => void;
@@ -39,6 +64,7 @@ export default function useRealTime({
     aoaiApiKeyOverride,
     aoaiModelOverride,
     enableInputAudioTranscription,
+    binaryAudio = true,
     onWebSocketOpen,
     onWebSocketClose,
     onWebSocketError,
@@ -55,8 +81,14 @@ export default function useRealTime({
         ? `${aoaiEndpointOverride}/openai/realtime?api-key=${aoaiApiKeyOverride}&deployment=${aoaiModelOverride}&api-version=2024-10-01-preview`
         : `/realtime`;
 
+    const negotiateBinaryAudio = binaryAudio && !useDirectAoaiApi;
+
     const { sendJsonMessage } = useWebSocket(wsEndpoint, {
-        onOpen: () => onWebSocketOpen?.(),
+        protocols: negotiateBinaryAudio ? [BINARY_AUDIO_PROTOCOL] : undefined,
+        onOpen: event => {
+            (event.target as WebSocket).binaryType = "arraybuffer";
+            onWebSocketOpen?.();
+        },
         onClose: () => onWebSocketClose?.(),
         onError: event => onWebSocketError?.(event),
         onMessage: event => onMessageReceived(event),
@@ -102,6 +134,14 @@ export default function useRealTime({
     const onMessageReceived = (event: MessageEvent<any>) => {
         onWebSocketMessage?.(event);
 
+        if (event.data instanceof ArrayBuffer) {
+            const delta = decodeAudioFrame(event.data);
+            if (delta) {
+                onReceivedResponseAudioDelta?.(delta);
+            }
+            return;
+        }
+
         let message: Message;
         try {
             message = JSON.parse(event.data);
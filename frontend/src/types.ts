@@ -38,6 +38,10 @@ export type Message = {
 export type ResponseAudioDelta = {
     type: "response.audio.delta";
     delta: string;
+    item_id?: string;
+    content_index?: number;
+    // Set instead of `delta` when the audio arrived as a binary frame.
+    pcm?: Int16Array;
 };
 
 export type ResponseAudioTranscriptDelta = {